@@ -0,0 +1,112 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Microbenchmark of memory allocations for operators and resolver frames.
+
+Datastructures, such as :obj:`jsontas.data_structures.operator.Operator`, and the
+frames of the resolver use '__slots__', so their instances have no '__dict__'.
+An operator also only binds the method of the operator it executes. Both are
+compared to unslotted subclasses, which allocate like the classes did before.
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/allocations.py --count 200000
+"""
+import argparse
+import time
+import tracemalloc
+
+from jsontas.dataset import Dataset
+from jsontas.jsontas import Frame
+from jsontas.data_structures.operator import Operator
+
+
+class UnslottedOperator(Operator):
+    """Operator with a '__dict__' which binds all operator methods, as before."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize, and bind all operator methods."""
+        super().__init__(*args, **kwargs)
+        self.operators  # pylint:disable=pointless-statement
+
+
+class UnslottedFrame(Frame):
+    """Frame with a '__dict__', as before."""
+
+
+def allocations(create, count):
+    """Count the memory blocks, and bytes, held by instances and what they were created with.
+
+    :param create: Function creating one instance.
+    :type create: function
+    :param count: Number of instances to create.
+    :type count: int
+    :return: Memory blocks and bytes per instance.
+    :rtype: tuple
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    instances = [create() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = after.compare_to(before, "filename")
+    blocks = sum(statistic.count_diff for statistic in statistics)
+    size = sum(statistic.size_diff for statistic in statistics)
+    del instances
+    # The list holding the instances is one block, of 8 bytes per instance.
+    return (blocks - 1) / count, (size - 8 * count) / count
+
+
+def duration(operator, count, dataset):
+    """Time creating and executing a number of operators.
+
+    :param operator: Operator class.
+    :type operator: type
+    :param count: Number of operators to create and execute.
+    :type count: int
+    :param dataset: Dataset for the operators.
+    :type dataset: :obj:`jsontas.dataset.Dataset`
+    :return: Time, in seconds.
+    :rtype: float
+    """
+    start = time.perf_counter()
+    for index in range(count):
+        operator("operator", {}, dataset, key=index, operator="$eq", value=1).execute()
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+    dataset = Dataset()
+    cases = (
+        ("Operator", Operator, UnslottedOperator,
+         lambda kind: lambda: kind("operator", {}, dataset, key=1, operator="$eq", value=1)),
+        ("Frame", Frame, UnslottedFrame,
+         lambda kind: lambda: kind({"a": 1}, {})),
+    )
+    for name, slotted, unslotted, factory in cases:
+        for label, kind in (("slotted", slotted), ("unslotted", unslotted)):
+            blocks, size = allocations(factory(kind), args.count)
+            print("{:9} {:10} {:5.1f} blocks {:6.1f} bytes per instance".format(
+                name, label, blocks, size))
+    for label, kind in (("slotted", Operator), ("unslotted", UnslottedOperator)):
+        print("Operator  {:10} {:.2f}s to create and execute {}".format(
+            label, duration(kind, args.count, dataset), args.count))
+
+
+if __name__ == "__main__":
+    main()
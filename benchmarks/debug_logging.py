@@ -0,0 +1,93 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of resolving a large template, with and without debug logging enabled.
+
+JSONTas checks once per run whether debug logging is enabled and, if it is not,
+makes no logger calls at all while resolving. Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/debug_logging.py --items 100000
+
+The template has about 11 nodes per item, i.e. about 1.1M nodes for 100000 items.
+"""
+import argparse
+import logging
+import time
+
+from jsontas.jsontas import JsonTas
+
+
+def template(items):
+    """Create a template with two queries, and 11 nodes, per item.
+
+    :param items: Number of items in the template.
+    :type items: int
+    :return: Template and the number of nodes in it.
+    :rtype: tuple
+    """
+    json_data = {
+        "items": [
+            {"id": index, "name": "$employee.name", "meta": {"occupation": "$employee.occupation",
+                                                           "tags": ["a", "b", "c", "d", "e"]}}
+            for index in range(items)
+        ]
+    }
+    return json_data, 2 + items * 11
+
+
+def measure(json_data, repeat):
+    """Resolve a template, read-only, and return the best time.
+
+    :param json_data: Template to resolve.
+    :type json_data: dict
+    :param repeat: Number of times to resolve the template.
+    :type repeat: int
+    :return: Best time, in seconds.
+    :rtype: float
+    """
+    jsontas = JsonTas()
+    jsontas.dataset.add("employee", {"name": "Jane Doe", "occupation": "Engineer"})
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        jsontas.run(json_data=json_data, readonly=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    json_data, nodes = template(args.items)
+
+    logging.basicConfig(level=logging.WARNING)
+    disabled = measure(json_data, args.repeat)
+    # Debug messages are created, but discarded, so only the cost of logging is measured.
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.NullHandler())
+    root.setLevel(logging.DEBUG)
+    enabled = measure(json_data, 1)
+    print("{} nodes: {:.2f}s with debug logging disabled, {:.2f}s with it enabled".format(
+        nodes, disabled, enabled))
+
+
+if __name__ == "__main__":
+    main()
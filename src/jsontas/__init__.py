@@ -14,13 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Distribution name and version."""
-from pkg_resources import get_distribution, DistributionNotFound
+# importlib.metadata is used instead of pkg_resources since importing
+# pkg_resources is slow and adds noticeably to the start-up time of the CLI.
+from importlib.metadata import version, PackageNotFoundError
 
 try:
     # Change here if project is renamed and does not equal the package name
     DIST_NAME = __name__
-    __version__ = get_distribution(DIST_NAME).version
-except DistributionNotFound:
+    __version__ = version(DIST_NAME)
+except PackageNotFoundError:
     __version__ = 'unknown'
 finally:
-    del get_distribution, DistributionNotFound
+    del version, PackageNotFoundError
@@ -15,13 +15,21 @@
 # limitations under the License.
 """Main module."""
 import argparse
+import os
 import sys
+import time
 import logging
 import json
 from pprint import pprint
 
-from jsontas import __version__
+from jsontas import __version__, codec
+from jsontas.cache import ResultCache
+from jsontas.diagnostics import Diagnostics
+from jsontas.incremental import Incremental
 from jsontas.jsontas import JsonTas
+from jsontas.memo import Memo
+from jsontas.template import Template
+from jsontas.writer import JsonWriter
 
 __author__ = "Tobias Persson"
 __copyright__ = "Tobias Persson"
@@ -37,7 +45,8 @@ def parse_args(args):
       :obj:`argparse.Namespace`: command line parameters namespace
     """
     parser = argparse.ArgumentParser(
-        description="JSONTas - JSON generation language")
+        description="JSONTas - JSON generation language",
+        epilog="Run 'jsontas serve --help' for serving JSONTas over HTTP.")
     parser.add_argument(
         "json_file"
     )
@@ -51,10 +60,127 @@ def parse_args(args):
         "-d",
         help="Custom dataset file to use. Will be opened and read as JSON."
     )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Read newline-delimited JSON from json_file ('-' for stdin) and write "
+             "one resolved JSON object per line. Errors are written to stderr."
+    )
+    parser.add_argument(
+        "--format",
+        "-f",
+        choices=JsonWriter.formats,
+        help="Write the generated JSON incrementally, as each top-level key is resolved, "
+             "in this format."
+    )
+    parser.add_argument(
+        "--fast-json",
+        action="store_true",
+        help="Use the faster 'orjson' encoder for --format, if it is installed."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for caching compiled JSON files between runs."
+    )
+    parser.add_argument(
+        "--result-cache",
+        help="Directory for caching generated JSON. Only used if the JSON file makes no "
+             "requests and reads nothing but plain values from the dataset."
+    )
+    parser.add_argument(
+        "--diagnostics",
+        action="store_true",
+        help="Collect errors from failing queries, instead of logging each of them, "
+             "and write a summary of them to stderr."
+    )
+    parser.add_argument(
+        "--watch",
+        "-w",
+        action="store_true",
+        help="Keep running and generate the JSON again whenever json_file, or the dataset "
+             "file, changes. Only the top-level keys affected by a change are resolved. "
+             "Can not be combined with --jsonl, --result-cache or --diagnostics."
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="How often, in seconds, to check the files for changes with --watch."
+    )
     parser.add_argument(
         "--version",
         action="version",
         version="jsontas {ver}".format(ver=__version__))
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="loglevel",
+        help="set loglevel to INFO",
+        action="store_const",
+        const=logging.INFO)
+    parser.add_argument(
+        "-vv",
+        "--very-verbose",
+        dest="loglevel",
+        help="set loglevel to DEBUG",
+        action="store_const",
+        const=logging.DEBUG)
+    args = parser.parse_args(args)
+    if args.watch:
+        for option, value in (("--jsonl", args.jsonl), ("--result-cache", args.result_cache),
+                              ("--diagnostics", args.diagnostics)):
+            if value:
+                parser.error("argument --watch: not allowed with argument %s" % option)
+    return args
+
+
+def parse_serve_args(args):
+    """Parse command line parameters for the 'serve' command.
+
+    Args:
+      args ([str]): command line parameters as list of strings
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(
+        prog="jsontas serve",
+        description="JSONTas - Resolve JSON structures posted over HTTP")
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Host to listen on. Default: 127.0.0.1"
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        type=int,
+        default=8000,
+        help="Port to listen on. Default: 8000"
+    )
+    parser.add_argument(
+        "--socket",
+        "-s",
+        help="Unix socket to listen on instead of host and port."
+    )
+    parser.add_argument(
+        "--dataset",
+        "-d",
+        help="Custom dataset file to use. Will be opened and read as JSON."
+    )
+    parser.add_argument(
+        "--templates",
+        type=int,
+        default=128,
+        help="Number of compiled JSON structures to keep between requests. Default: 128"
+    )
+    parser.add_argument(
+        "--memo",
+        type=int,
+        default=0,
+        help="Number of results from pure datastructures to keep between requests. "
+             "Default: 0 (disabled)"
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -72,37 +198,253 @@ def parse_args(args):
     return parser.parse_args(args)
 
 
-def setup_logging(loglevel):
+def setup_logging(loglevel, stream=sys.stdout):
     """Set up basic logging.
 
     Args:
       loglevel (int): minimum loglevel for emitting messages
+      stream (file): stream to emit log messages to
     """
     logformat = "[%(asctime)s] %(levelname)s:%(name)s:%(message)s"
-    logging.basicConfig(level=loglevel, stream=sys.stdout,
+    logging.basicConfig(level=loglevel, stream=stream,
                         format=logformat, datefmt="%Y-%m-%d %H:%M:%S")
 
 
-def main(args):
-    """Entry point allowing external calls.
+def load_jsontas(dataset_file=None):
+    """Create a JSONTas instance, with a custom dataset if supplied.
+
+    Args:
+      dataset_file (str): JSON file to merge into the dataset
+
+    Returns:
+      :obj:`jsontas.jsontas.JsonTas`: JSONTas instance
+    """
+    jsontas = JsonTas()
+    if dataset_file:
+        jsontas.dataset.merge(codec.load(dataset_file))
+    return jsontas
+
+
+def resolve_lines(jsontas, input_file, output_file, error_file, diagnostics=None):
+    """Resolve newline-delimited JSON structures, one line at a time.
+
+    Each resolved JSON structure is written, and flushed, as a single line to
+    output_file as soon as it is resolved. Lines that fail are reported as a
+    JSON object with line number and error on error_file instead.
+
+    Args:
+      jsontas (:obj:`jsontas.jsontas.JsonTas`): JSONTas instance to resolve with
+      input_file (file): file to read newline-delimited JSON from
+      output_file (file): file to write resolved JSON lines to
+      error_file (file): file to write errors to
+      diagnostics (:obj:`jsontas.diagnostics.Diagnostics`): record errors from failing
+        queries here, instead of logging them
+    """
+    for line_number, line in enumerate(input_file, start=1):
+        if not line.strip():
+            continue
+        try:
+            json_data = codec.loads(line)
+            # The JSON data is parsed for this line only, no need for a copy.
+            output = codec.dumps(jsontas.run(json_data=json_data, copy=False,
+                                             diagnostics=diagnostics))
+        except Exception as exception:  # pylint:disable=broad-except
+            error_file.write(codec.dumps({"line": line_number, "error": str(exception)}) + "\n")
+            error_file.flush()
+            continue
+        output_file.write(output + "\n")
+        output_file.flush()
+
+
+def serve(args):
+    """Serve JSONTas over HTTP until interrupted.
+
+    The dataset is loaded once and shared, together with all caches, between
+    every request made to the server.
 
     Args:
       args ([str]): command line parameter list
     """
-    args = parse_args(args)
+    # Only import the HTTP server when serving, to keep start-up fast otherwise.
+    # pylint:disable=import-outside-toplevel
+    from jsontas.server import create_server
+    args = parse_serve_args(args)
     setup_logging(args.loglevel)
-    jsontas = JsonTas()
-    if args.dataset:
-        with open(args.dataset) as json_file:
-            dataset = json.load(json_file)
-        jsontas.dataset.merge(dataset)
+    jsontas = load_jsontas(args.dataset)
+    if args.memo:
+        jsontas.dataset.memo = Memo(maxsize=args.memo)
+    server = create_server(jsontas, args.host, args.port, args.socket, args.templates)
+    logging.getLogger("JSONTasServer").info("Serving JSONTas on %r", server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket:
+            os.unlink(args.socket)
+
+
+def write_output(args, data):
+    """Write generated JSON to the output file, or to stdout if there is none.
 
-    data = jsontas.run(json_file=args.json_file)
-    if args.output:
+    Args:
+      args (:obj:`argparse.Namespace`): command line parameters namespace
+      data (any): generated JSON
+    """
+    if args.format:
+        output_file = open(args.output, "w") if args.output else sys.stdout
+        try:
+            writer = JsonWriter(output_file, args.format, args.fast_json)
+            writer.write(data.items() if isinstance(data, dict) else ((None, data),))
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+    elif args.output:
         with open(args.output, "w") as output_file:
             json.dump(data, output_file)
     else:
         pprint(data)
+    sys.stdout.flush()
+
+
+def file_stamp(path):
+    """Modification time and size of a file, for detecting changes to it.
+
+    Args:
+      path (str): path to file
+
+    Returns:
+      tuple: modification time and size, or None if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def watch(args, jsontas):
+    """Generate JSON, and generate it again whenever the JSON file or dataset file changes.
+
+    The parsed JSON file, the dataset and the generated JSON are kept in memory between
+    changes. Only the top-level keys that were edited, or that read dataset values that
+    changed or were removed, are resolved again (see :obj:`jsontas.incremental.Incremental`).
+    Responses of successful GET requests are reused instead of being requested again.
+
+    Args:
+      args (:obj:`argparse.Namespace`): command line parameters namespace
+      jsontas (:obj:`jsontas.jsontas.JsonTas`): JSONTas instance, with the dataset loaded
+    """
+    logger = logging.getLogger("JSONTas")
+    jsontas.dataset.responses = {}
+    paths = [path for path in (args.json_file, args.dataset) if path]
+    stamps = {path: file_stamp(path) for path in paths}
+    dataset = codec.load(args.dataset) if args.dataset else {}
+    incremental = Incremental(jsontas, Template.load(args.json_file, args.cache_dir))
+    write_output(args, incremental.run())
+    try:
+        while True:
+            time.sleep(args.interval)
+            changed = [path for path in paths if file_stamp(path) != stamps[path]]
+            if not changed:
+                continue
+            for path in changed:
+                stamps[path] = file_stamp(path)
+            try:
+                if args.dataset in changed:
+                    new_dataset = codec.load(args.dataset)
+                    for key, value in new_dataset.items():
+                        if key not in dataset or dataset[key] != value:
+                            jsontas.dataset.add(key, value)
+                    for key in dataset:
+                        if key not in new_dataset:
+                            jsontas.dataset.remove(key)
+                    dataset = new_dataset
+                if args.json_file in changed:
+                    incremental.edit(Template.load(args.json_file, args.cache_dir))
+            except (OSError, ValueError) as exception:
+                # Files are often saved in several steps, wait for the next change.
+                logger.error("Could not load changes to %r: %s", changed, exception)
+                continue
+            keys = incremental.update()
+            logger.info("Generated JSON again. Resolved %r.", keys)
+            write_output(args, incremental.output)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        incremental.close()
+
+
+def write_diagnostics(diagnostics):
+    """Write a summary of diagnostics, if any, to stderr.
+
+    Args:
+      diagnostics (:obj:`jsontas.diagnostics.Diagnostics`): diagnostics collected
+        during a run, or None
+    """
+    if diagnostics is not None:
+        sys.stderr.write(codec.dumps(diagnostics.summary()) + "\n")
+
+
+def main(args):
+    """Entry point allowing external calls.
+
+    Args:
+      args ([str]): command line parameter list
+    """
+    if args and args[0] == "serve":
+        serve(args[1:])
+        return
+    args = parse_args(args)
+    if args.jsonl:
+        # Keep stdout clean for the resolved JSON lines.
+        setup_logging(args.loglevel, sys.stderr)
+    else:
+        setup_logging(args.loglevel)
+    jsontas = load_jsontas(args.dataset)
+    diagnostics = Diagnostics() if args.diagnostics else None
+
+    if args.jsonl:
+        input_file = sys.stdin if args.json_file == "-" else open(args.json_file)
+        output_file = open(args.output, "w") if args.output else sys.stdout
+        try:
+            resolve_lines(jsontas, input_file, output_file, sys.stderr, diagnostics)
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+            if output_file is not sys.stdout:
+                output_file.close()
+        write_diagnostics(diagnostics)
+        return
+
+    if args.watch:
+        watch(args, jsontas)
+        return
+
+    if args.format:
+        output_file = open(args.output, "w") if args.output else sys.stdout
+        try:
+            writer = JsonWriter(output_file, args.format, args.fast_json)
+            template = Template.load(args.json_file, args.cache_dir, ordered=False)
+            if args.result_cache:
+                data = jsontas.run(json_data=template, copy=False,
+                                   cache=ResultCache(args.result_cache), diagnostics=diagnostics)
+                writer.write(data.items() if isinstance(data, dict) else ((None, data),))
+            else:
+                writer.write(jsontas.stream(json_data=template, copy=False,
+                                            diagnostics=diagnostics))
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+        write_diagnostics(diagnostics)
+        return
+
+    template = Template.load(args.json_file, args.cache_dir)
+    cache = ResultCache(args.result_cache) if args.result_cache else None
+    data = jsontas.run(json_data=template, copy=False, cache=cache, diagnostics=diagnostics)
+    write_output(args, data)
+    write_diagnostics(diagnostics)
 
 
 def run():
@@ -0,0 +1,148 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Cache module.
+
+Caches are stored using pickle and must only be shared with trusted users.
+"""
+import os
+import json
+import hashlib
+import logging
+import pickle
+import tempfile
+from jsontas import __version__
+from jsontas.data_structures.datastructure import DataStructure
+
+MISSING = object()
+LOGGER = logging.getLogger("Cache")
+
+
+def read_pickle(path):
+    """Read a pickled object from a cache file.
+
+    :param path: Path to cache file.
+    :type path: str
+    :return: The cached object or :obj:`MISSING` if there is no usable cache.
+    :rtype: any
+    """
+    try:
+        with open(path, "rb") as cache_file:
+            return pickle.load(cache_file)
+    except FileNotFoundError:
+        return MISSING
+    except Exception:  # pylint:disable=broad-except
+        LOGGER.warning("Ignoring unreadable cache %r", path)
+        return MISSING
+
+
+def write_pickle(path, value):
+    """Write an object to a cache file, atomically.
+
+    Errors are logged, but otherwise ignored, since caching is optional.
+
+    :param path: Path to cache file.
+    :type path: str
+    :param value: Object to cache.
+    :type value: any
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as cache_file:
+            pickle.dump(value, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file.name, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        LOGGER.warning("Could not write cache %r", path)
+
+
+class ResultCache:
+    """Cache of whole JSONTas runs, stored in a directory.
+
+    A result is keyed by the JSON data and by the dataset values that the JSON
+    data reads. JSON data that uses a datastructure which is not deterministic
+    (such as '$request' or '$wait'), or dataset values that can not be
+    serialized (such as functions), is never cached::
+
+        JsonTas().run(json_data=json_data, cache=ResultCache("/tmp/jsontas"))
+    """
+
+    def __init__(self, directory):
+        """Initialize cache.
+
+        :param directory: Directory to store results in.
+        :type directory: str
+        """
+        self.directory = directory
+
+    @staticmethod
+    def fingerprint(template, dataset):
+        """Fingerprint JSON data and the dataset values it reads.
+
+        :param template: Compiled JSON data.
+        :type template: :obj:`jsontas.template.Template`
+        :param dataset: Dataset that the JSON data will be resolved against.
+        :type dataset: :obj:`jsontas.dataset.Dataset`
+        :return: Hex digest or None if the run can not be cached.
+        :rtype: str or None
+        """
+        digest = hashlib.sha256()
+        digest.update("jsontas {} {}\0".format(
+            __version__, type(template.json_data).__name__).encode("utf-8"))
+        try:
+            digest.update((template.digest or json.dumps(template.json_data)).encode("utf-8"))
+            for name in sorted(template.names):
+                if name in dataset.run_scoped:
+                    continue
+                value = dataset.get(name)
+                # pylint: disable=unidiomatic-typecheck
+                if type(value) == type(DataStructure):
+                    if not (issubclass(value, DataStructure) and value.deterministic):
+                        return None
+                    value = "{}.{}".format(value.__module__, value.__qualname__)
+                digest.update("\0{}\0{}".format(name, json.dumps(value)).encode("utf-8"))
+        except (TypeError, ValueError):
+            return None
+        return digest.hexdigest()
+
+    def __path(self, key):
+        """Path to cache file of a key.
+
+        :param key: Cache key.
+        :type key: str
+        :return: Path to cache file.
+        :rtype: str
+        """
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, key):
+        """Get a cached result.
+
+        :param key: Cache key, see :meth:`fingerprint`.
+        :type key: str
+        :return: Cached result or :obj:`MISSING`.
+        :rtype: any
+        """
+        return read_pickle(self.__path(key))
+
+    def set(self, key, value):
+        """Cache a result.
+
+        :param key: Cache key, see :meth:`fingerprint`.
+        :type key: str
+        :param value: Result to cache.
+        :type value: any
+        """
+        write_pickle(self.__path(key), value)
@@ -0,0 +1,127 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""JSON codec module.
+
+Loads and dumps JSON using 'orjson' when it is installed, falling back to
+the standard library 'json' module when it is not, or when 'orjson' does
+not support the data (such as NaN or integers larger than 64 bits).
+"""
+import json
+from collections import OrderedDict
+from copy import deepcopy
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def copy(data):
+    """Deep copy JSON data without recursion, so that its depth is not limited.
+
+    Dictionaries, ordered dictionaries and lists are copied iteratively. Anything else
+    is copied using :func:`copy.deepcopy`. Like :func:`copy.deepcopy`, values that are
+    referenced more than once are copied once.
+
+    :param data: JSON data to copy.
+    :type data: any
+    :return: Copy of data.
+    :rtype: any
+    """
+    if type(data) in PRIMITIVES:  # pylint:disable=unidiomatic-typecheck
+        return data
+    memo = {}
+    root = [None]
+    stack = [(root, 0, data)]
+    while stack:
+        parent, key, value = stack.pop()
+        kind = type(value)
+        if kind in PRIMITIVES:
+            new = value
+        elif id(value) in memo:
+            new = memo[id(value)]
+        elif kind is dict or kind is OrderedDict:
+            new = kind.fromkeys(value)
+            memo[id(value)] = new
+            stack.extend((new, item_key, item) for item_key, item in value.items())
+        elif kind is list:
+            new = [None] * len(value)
+            memo[id(value)] = new
+            stack.extend((new, index, item) for index, item in enumerate(value))
+        else:
+            new = deepcopy(value, memo)
+        parent[key] = new
+    return root[0]
+
+
+def loads(data, ordered=False):
+    """Parse a JSON document.
+
+    :param data: JSON document to parse.
+    :type data: str or bytes
+    :param ordered: Parse JSON objects as :obj:`OrderedDict` instead of dict.
+                    This always uses the 'json' module.
+    :type ordered: bool
+    :return: Parsed JSON data.
+    :rtype: any
+    """
+    if ordered:
+        return json.loads(data, object_pairs_hook=OrderedDict)
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def load(json_file, ordered=False):
+    """Parse a JSON file.
+
+    :param json_file: Path to JSON file to parse.
+    :type json_file: str
+    :param ordered: Parse JSON objects as :obj:`OrderedDict` instead of dict.
+    :type ordered: bool
+    :return: Parsed JSON data.
+    :rtype: any
+    """
+    with open(json_file, "rb") as _file:
+        return loads(_file.read(), ordered)
+
+
+def dumps(data, indent=None, fast=True):
+    """Serialize data to a JSON string, without any extra whitespace unless indented.
+
+    :param data: Data to serialize.
+    :type data: any
+    :param indent: Indent JSON with this many spaces. 'orjson' is only used for
+                   no indentation or an indentation of 2.
+    :type indent: int or None
+    :param fast: Whether or not to use 'orjson', if installed.
+    :type fast: bool
+    :return: JSON string.
+    :rtype: str
+    """
+    if fast and orjson is not None and indent in (None, 2):
+        option = orjson.OPT_INDENT_2 if indent else 0
+        try:
+            return orjson.dumps(data, option=option).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(data, indent=indent, separators=(",", ": ") if indent else (",", ":"))
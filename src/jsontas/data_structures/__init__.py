@@ -13,13 +13,110 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Datastructure."""
-from .condition import Condition
-from .operator import Operator
-from .list import List
-from .request import Request
-from .filter import Filter
-from .expand import Expand
-from .from_item import From
-from .wait import Wait
-from .reduce import Reduce
+"""Datastructure.
+
+Datastructures are registered by name in :obj:`DATA_STRUCTURES` and their
+modules are only imported the first time they are used. This keeps, for
+instance, 'requests' from being imported unless a '$request' is made.
+
+Other packages can provide datastructures through the
+'jsontas.data_structures' entry point group. Plugins are looked up by name
+when a query first uses them, and only that plugin is imported::
+
+    [options.entry_points]
+    jsontas.data_structures =
+        mystructure = mypackage.mymodule:MyStructure
+
+    # {"data": {"$mystructure": {"some": "parameters"}}}
+
+Built-in datastructures take precedence over plugins with the same name.
+"""
+from importlib import import_module
+from importlib.metadata import entry_points
+
+# The name used in JSONTas queries ("$name") mapped to "module:class".
+DATA_STRUCTURES = {
+    "condition": "jsontas.data_structures.condition:Condition",
+    "operator": "jsontas.data_structures.operator:Operator",
+    "list": "jsontas.data_structures.list:List",
+    "request": "jsontas.data_structures.request:Request",
+    "filter": "jsontas.data_structures.filter:Filter",
+    "groupby": "jsontas.data_structures.groupby:GroupBy",
+    "join": "jsontas.data_structures.join:Join",
+    "expand": "jsontas.data_structures.expand:Expand",
+    "from": "jsontas.data_structures.from_item:From",
+    "wait": "jsontas.data_structures.wait:Wait",
+    "reduce": "jsontas.data_structures.reduce:Reduce"
+}
+ENTRY_POINT_GROUP = "jsontas.data_structures"
+LOADED = {}
+PLUGINS = None
+
+
+def import_path(path):
+    """Import an object from a "module:attribute" path.
+
+    :param path: Path to import.
+    :type path: str
+    :return: The imported object.
+    :rtype: any
+    """
+    module, _, attribute = path.partition(":")
+    return getattr(import_module(module), attribute)
+
+
+def plugins():
+    """Entry points of all datastructure plugins, by name. Plugins are not imported.
+
+    The installed entry points are only scanned once, on the first call.
+
+    :return: Entry points by datastructure name.
+    :rtype: dict
+    """
+    global PLUGINS  # pylint:disable=global-statement
+    if PLUGINS is None:
+        try:
+            found = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10 does not support selecting entry points.
+            found = entry_points().get(ENTRY_POINT_GROUP, ())
+        PLUGINS = {entry_point.name: entry_point for entry_point in found}
+    return PLUGINS
+
+
+def load(name):
+    """Load a built-in or plugin datastructure by name, importing its module if necessary.
+
+    :param name: Name of the datastructure, e.g. 'condition'.
+    :type name: str
+    :return: The datastructure class or None if there is no datastructure with that name.
+    :rtype: :obj:`jsontas.data_structures.datastructure.DataStructure` or None
+    """
+    try:
+        return LOADED[name]
+    except KeyError:
+        pass
+    path = DATA_STRUCTURES.get(name)
+    if path is not None:
+        datastructure = import_path(path)
+    else:
+        entry_point = plugins().get(name)
+        if entry_point is None:
+            return None
+        datastructure = entry_point.load()
+    LOADED[name] = datastructure
+    return datastructure
+
+
+def __getattr__(name):
+    """Import datastructure classes when accessed, e.g. 'from jsontas.data_structures import List'.
+
+    :param name: Class name of datastructure.
+    :type name: str
+    :return: Datastructure class.
+    :rtype: :obj:`jsontas.data_structures.datastructure.DataStructure`
+    """
+    for path in DATA_STRUCTURES.values():
+        if path.endswith(":" + name):
+            return import_path(path)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -65,6 +65,10 @@ class Condition(DataStructure):
     .. automethod:: _else
     """
 
+    deterministic = True
+    pure = True
+    __slots__ = ()
+
     def _if(self, operator):
         """If operator.
 
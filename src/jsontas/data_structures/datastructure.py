@@ -19,7 +19,40 @@
 
 
 class DataStructure:
-    """Base datastructure class."""
+    """Base datastructure class.
+
+    Set 'deterministic' to True in datastructures that always give the same result
+    given the same dataset, i.e. that make no requests and do not depend on time.
+    Only JSON data with deterministic datastructures can be cached,
+    see :obj:`jsontas.cache.ResultCache`.
+
+    Set 'pure' to True in datastructures whose result only depends on the jsonkey
+    and the parameters (data) passed to it. Pure datastructures can be memoized,
+    see :obj:`jsontas.memo.Memo`.
+
+    Override :meth:`rewrite` to rewrite the JSON data below the datastructure key
+    before it is resolved, e.g. to push a limit down into a nested datastructure.
+    """
+
+    deterministic = False
+    pure = False
+    # Datastructures are created for every query, so keep instances small. Subclasses
+    # that do not define '__slots__' themselves still get a '__dict__'.
+    __slots__ = ("jsonkey", "datasubset", "dataset", "data")
+
+    @classmethod
+    def rewrite(cls, data):
+        """Rewrite the unresolved JSON data 'below' this datastructure key.
+
+        This is called before the JSON data is resolved, so that values in it
+        may still be JSONTas queries. The JSON data must not be modified in place.
+
+        :param data: Unresolved parameters of this datastructure.
+        :type data: dict
+        :return: The same parameters or new, rewritten, parameters.
+        :rtype: dict
+        """
+        return data
 
     def __init__(self, jsonkey, datasubset, dataset, **data):
         """Initialize.
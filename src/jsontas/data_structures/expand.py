@@ -14,11 +14,75 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Expand datastructure."""
-from copy import deepcopy
+import os
+import pickle
+import logging
+from copy import copy, deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from jsontas.diagnostics import Diagnostics
 from .datastructure import DataStructure
 
 # pylint:disable=too-few-public-methods
 
+# Dataset and value to expand, in a worker process of a parallel expand.
+SNAPSHOT = {}
+
+
+def expand(dataset, value, indexes):
+    """Resolve one copy of a value for each index.
+
+    :param dataset: Dataset to resolve the copies against.
+    :type dataset: :obj:`jsontas.dataset.Dataset`
+    :param value: Unresolved value to expand.
+    :type value: any
+    :param indexes: Indexes to expand the value at.
+    :type indexes: iterable
+    :return: Resolved values, in index order.
+    :rtype: list
+    """
+    # This is a circular import.
+    # pylint:disable=cyclic-import
+    # pylint:disable=import-outside-toplevel
+    from jsontas.jsontas import JsonTas
+    jsontas = JsonTas(dataset)
+    evaluated = []
+    for index in indexes:
+        copied = deepcopy(value)
+        dataset.add("expand_index", index)
+        dataset.add("expand_value", copied)
+        evaluated.append(jsontas.resolve(json_data=copied))
+    return evaluated
+
+
+def initialize_worker(snapshot):
+    """Load the dataset and value to expand in a worker process. Called once per worker.
+
+    :param snapshot: Pickled dataset and value.
+    :type snapshot: bytes
+    """
+    SNAPSHOT["dataset"], SNAPSHOT["value"] = pickle.loads(snapshot)
+
+
+def expand_shard(indexes):
+    """Expand the value of this worker process at a range of indexes.
+
+    :param indexes: Indexes to expand the value at.
+    :type indexes: range
+    :return: Resolved values, in index order, errors recorded in the diagnostics of
+             the dataset and names read from the dataset, while expanding them.
+    :rtype: tuple
+    """
+    dataset = SNAPSHOT["dataset"]
+    if dataset.diagnostics is not None:
+        dataset.diagnostics.errors.clear()
+    if dataset.reads is not None:
+        dataset.reads.clear()
+    evaluated = expand(dataset, SNAPSHOT["value"], indexes)
+    errors = list(dataset.diagnostics.errors) if dataset.diagnostics is not None else []
+    reads = set(dataset.reads) if dataset.reads is not None else set()
+    return evaluated, errors, reads
+
 
 class Expand(DataStructure):
     """Expand datastructure.
@@ -82,26 +146,111 @@ class Expand(DataStructure):
                 "something"
             ]
         }
+
+    Add a "limit" to expand to at most that many elements.
+
+    Add "processes" to resolve the elements in parallel, in that many worker processes
+    (0 for one per CPU). Each worker gets a snapshot of the dataset, pickled once, and
+    resolves a range of indexes with its own 'expand_index'. Errors recorded by the
+    workers are added to the diagnostics of the run, if any, but values that the elements
+    add to the dataset, such as 'response', are not added to the dataset of the JSON data.
+    If the dataset can not be pickled (e.g. it holds functions), or the workers fail,
+    the elements are resolved one after another instead.
     """
 
+    logger = logging.getLogger("Expand")
+    # Number of shards per worker process. More shards even out the work between workers.
+    shards_per_process = 4
+    deterministic = True
+    __slots__ = ()
+
+    def __snapshot(self, value):
+        """Pickle the dataset, without its process-local state, and the value to expand.
+
+        :param value: Unresolved value to expand.
+        :type value: any
+        :return: Pickled dataset and value, or None if they can not be pickled.
+        :rtype: bytes or None
+        """
+        dataset = copy(self.dataset)
+        dataset.memo = None
+        if self.dataset.diagnostics is not None:
+            dataset.diagnostics = Diagnostics(self.dataset.diagnostics.tracebacks)
+        dataset.indexes = {}
+        dataset.observers = []
+        if self.dataset.reads is not None:
+            dataset.reads = set()
+            dataset.writes = set(self.dataset.writes or ())
+        dataset.responses = None
+        try:
+            return pickle.dumps((dataset, value), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:  # pylint:disable=broad-except
+            self.logger.warning("Could not pickle the dataset, expanding in a single process.")
+            return None
+
+    def __parallel(self, value, amount, processes):
+        """Expand a value in a pool of worker processes.
+
+        :param value: Unresolved value to expand.
+        :type value: any
+        :param amount: Number of elements to expand to.
+        :type amount: int
+        :param processes: Number of worker processes.
+        :type processes: int
+        :return: Resolved values, in index order, or None if the value could not be
+                 expanded in parallel.
+        :rtype: list or None
+        """
+        snapshot = self.__snapshot(value)
+        if snapshot is None:
+            return None
+        processes = min(processes, amount)
+        size = -(-amount // (processes * self.shards_per_process))
+        shards = [range(start, min(start + size, amount)) for start in range(0, amount, size)]
+        try:
+            with ProcessPoolExecutor(max_workers=processes, initializer=initialize_worker,
+                                     initargs=(snapshot,)) as executor:
+                results = list(executor.map(expand_shard, shards))
+        except (OSError, BrokenProcessPool):
+            self.logger.warning("Could not start worker processes, expanding in a single process.")
+            return None
+        except Exception:  # pylint:disable=broad-except
+            # E.g. values that can not be pickled, or unpickled, by the workers.
+            self.logger.warning("Could not expand in worker processes, expanding in a single "
+                                "process.", exc_info=True)
+            return None
+        # Only once all shards are done, so that nothing is recorded twice on fallback.
+        evaluated = []
+        for values, errors, reads in results:
+            evaluated.extend(values)
+            if errors:
+                self.dataset.diagnostics.errors.extend(errors)
+            if reads:
+                self.dataset.reads.update(reads)
+        return evaluated
+
     def execute(self):
         """Execute expand.
 
         :return: None and a list of values.
         :rtype: tuple
         """
-        # This is a circular import.
-        # pylint:disable=cyclic-import
-        # pylint:disable=import-outside-toplevel
-        from jsontas.jsontas import JsonTas
-        jsontas = JsonTas(self.dataset)
         query_tree = self.dataset.get("query_tree")
         amount = self.data.get("to", 0)
+        limit = self.data.get("limit")
+        if limit is not None:
+            amount = min(amount, limit)
 
-        evaluated = []
-        for index in range(amount):
-            value = deepcopy(query_tree.get("value"))
-            self.dataset.add("expand_index", index)
-            self.dataset.add("expand_value", value)
-            evaluated.append(jsontas.resolve(json_data=value))
-        return None, evaluated
+        value = query_tree.get("value")
+        processes = self.data.get("processes")
+        # pylint:disable=unidiomatic-typecheck
+        if processes is not None and (type(processes) is not int or processes < 0):
+            self.logger.warning("'processes' must be an integer, 0 or larger, not %r. "
+                                "Expanding in a single process.", processes)
+            processes = None
+        # Worker processes never start workers of their own.
+        if processes is not None and amount > 1 and not SNAPSHOT:
+            evaluated = self.__parallel(value, amount, processes or os.cpu_count() or 1)
+            if evaluated is not None:
+                return None, evaluated
+        return None, expand(self.dataset, value, range(amount))
@@ -15,6 +15,8 @@
 # limitations under the License.
 """Filter datastructure."""
 from copy import deepcopy
+from jsontas import codec
+from jsontas.cache import MISSING
 from .datastructure import DataStructure
 
 
@@ -51,8 +53,29 @@ class Filter(DataStructure):
             }
         }
         # {"data": [{"status": "success", "value": "1"}, {"status": "success", "value": "3"}]}
+
+    Add a "limit" to stop filtering as soon as that many items have been found.
+
+    Filters with the "$eq" or "$in" operator on a key (that is not a query) use a
+    hash index of the items on that key, so that filtering the same items many
+    times in a run, e.g. in an "$expand", only goes through all items once.
+    The index is stored in the run context of the dataset, one per key, and is built
+    the second time that the same list is filtered on that key. It is replaced if
+    another list, or a list of another length, is filtered on the key.
+
+    Note that the index is only checked against the identity and the length of the
+    list, since checking the items themselves costs as much as rebuilding it. If the
+    items of a list, or their keys, are changed in place during a run (e.g. by a
+    function in the dataset) without changing its length, "$eq" and "$in" filters
+    later in that run may miss items that now match. Add the changed list to the
+    dataset again, as a new list, to filter it correctly. Indexes never outlive a run.
     """
 
+    deterministic = True
+    pure = True
+    __slots__ = ()
+    indexed_operators = ("$eq", "$in")
+
     def filter(self, item):
         """Execute the filtering list against item.
 
@@ -120,6 +143,114 @@ class Filter(DataStructure):
                 return False
         return True
 
+    @staticmethod
+    def item_value(dataset, item, key):
+        """Look up the value of a key, relative to an item, as '$item.<key>'.
+
+        The item is added to the dataset as 'item' before the lookup.
+
+        :param dataset: Dataset to look up the key in.
+        :type dataset: :obj:`jsontas.dataset.Dataset`
+        :param item: Item to look up the key in.
+        :type item: any
+        :param key: Key, or key path, in the item. E.g. "status" or "meta.status".
+        :type key: str
+        :return: Value of the key in the item.
+        :rtype: any
+        """
+        dataset.add("item", item)
+        _, value = dataset.lookup("$item.{}".format(key), {})
+        return value
+
+    @staticmethod
+    def hashable(value):
+        """Make a key value hashable, so that items can be grouped, or joined, on it.
+
+        Values that are not hashable, such as lists, are replaced by their JSON
+        representation, tagged so that it never equals a string with the same text.
+
+        :param value: Key value.
+        :type value: any
+        :return: The value itself, if it is hashable, or ("json", <JSON representation>).
+        :rtype: any
+        """
+        try:
+            hash(value)
+        except TypeError:
+            return ("json", codec.dumps(value))
+        return value
+
+    def __index(self, items, key, build=True):
+        """Get, or build, a hash index of items by the value of a key in each item.
+
+        Only one list is indexed per key. The index is built the second time that the
+        same list is filtered on the key, since lists that are only filtered once (e.g.
+        those copied for each element of an "$expand") gain nothing from an index.
+
+        :param items: Items to index.
+        :type items: list or tuple
+        :param key: Key, in each item, to index on.
+        :type key: str
+        :param build: Whether to build the index if it does not exist.
+        :type build: bool
+        :return: Positions of items, by key value. None if items are not, or can not
+                 be, indexed.
+        :rtype: dict or None
+        """
+        entry = self.dataset.indexes.get(key)
+        if entry is None or entry[0] is not items or entry[1] != len(items):
+            if build:
+                # Keep a reference to the items, so that their id is not reused.
+                self.dataset.indexes[key] = (items, len(items), MISSING)
+            return None
+        if entry[2] is not MISSING or not build:
+            return entry[2] if entry[2] is not MISSING else None
+        index = {}
+        try:
+            for position, item in enumerate(items):
+                value = self.item_value(self.dataset, item, key)
+                index.setdefault(value, []).append(position)
+        except TypeError:
+            # Unhashable values can not be indexed.
+            index = None
+        self.dataset.indexes[key] = (items, len(items), index)
+        return index
+
+    def __candidates(self, items, build=True):
+        """Find the items that may match the filters, using a hash index.
+
+        :param items: Items to filter.
+        :type items: any
+        :param build: Whether to build an index if it does not exist.
+        :type build: bool
+        :return: Candidate items, in order, or None if no index could be used.
+        :rtype: list or None
+        """
+        if not isinstance(items, (list, tuple)):
+            return None
+        for _filter in self.data.get("filters") or []:
+            key = _filter.get("key")
+            operator = _filter.get("operator")
+            value = _filter.get("value")
+            if not isinstance(key, str) or key.startswith("$"):
+                continue
+            if operator not in self.indexed_operators:
+                continue
+            if operator == "$in" and not isinstance(value, (list, tuple)):
+                continue
+            index = self.__index(items, key, build)
+            if index is None:
+                continue
+            try:
+                if operator == "$eq":
+                    positions = index.get(value, [])
+                else:
+                    positions = sorted(set().union(*(index.get(each, ()) for each in value)))
+            except TypeError:
+                continue
+            return [items[position] for position in positions]
+        return None
+
     def execute(self):
         """Execute the filter datastructure.
 
@@ -129,7 +260,21 @@ class Filter(DataStructure):
         value = []
         if not isinstance(self.data.get("items"), (list, tuple, set)):
             return None, value
-        for item in self.data.get("items", []):
+        limit = self.data.get("limit")
+        if limit is not None and limit <= 0:
+            return None, value
+        # Only build an index if all items would have been filtered anyway.
+        items = self.data.get("items")
+        candidates = self.__candidates(items, build=limit is None)
+        if candidates is None:
+            candidates = items
+        for item in candidates:
             if self.filter(item):
                 value.append(item)
+                if limit is not None and len(value) >= limit:
+                    break
+        else:
+            if candidates is not items and items:
+                # Leave 'item' as if every item had been filtered.
+                self.dataset.add("item", items[-1])
         return None, value
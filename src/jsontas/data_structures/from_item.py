@@ -38,6 +38,10 @@ class From(DataStructure):
         # {"hello": "world"}
     """
 
+    deterministic = True
+    pure = True
+    __slots__ = ()
+
     def execute(self):
         """Execute the $from datastructure.
 
@@ -0,0 +1,110 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Group by datastructure."""
+from .datastructure import DataStructure
+from .filter import Filter
+
+
+class GroupBy(DataStructure):
+    """Group by datastructure.
+
+    Partition a list of items by the value of a key in each item, in a single pass.
+    The key is looked up in each item the same way as in
+    :obj:`jsontas.data_structures.filter.Filter`, i.e. as "$item.<key>".
+
+    Example::
+
+        {
+            "data": {
+                "$groupby": {
+                    "items": [
+                        {
+                            "status": "success",
+                            "value": "1"
+                        },
+                        {
+                            "status": "failure",
+                            "value": "2"
+                        },
+                        {
+                            "status": "success",
+                            "value": "3"
+                        }
+                    ],
+                    "key": "status"
+                }
+            }
+        }
+        # {
+        #     "data": {
+        #         "success": [{"status": "success", "value": "1"},
+        #                     {"status": "success", "value": "3"}],
+        #         "failure": [{"status": "failure", "value": "2"}]
+        #     }
+        # }
+
+    Set "count" to true to only count the number of items in each group::
+
+        # {"data": {"success": 2, "failure": 1}}
+
+    Groups are ordered by first appearance. Key values that are not hashable,
+    such as lists, are grouped by their JSON representation. It is an error if
+    a string key value is that same JSON representation.
+    """
+
+    deterministic = True
+    pure = True
+    __slots__ = ()
+
+    def execute(self):
+        """Execute the group by datastructure.
+
+        :return: None and the groups.
+        :rtype: tuple
+        """
+        items = self.data.get("items")
+        key = self.data.get("key")
+        count = self.data.get("count", False)
+        groups = {}
+        if not isinstance(items, (list, tuple, set)) or not isinstance(key, str):
+            return None, groups
+        for item in items:
+            value = Filter.hashable(Filter.item_value(self.dataset, item, key))
+            if count:
+                groups[value] = groups.get(value, 0) + 1
+            else:
+                groups.setdefault(value, []).append(item)
+        return None, self.__output(groups)
+
+    @staticmethod
+    def __output(groups):
+        """Name the groups of key values that are not hashable by their JSON representation.
+
+        :raises: ValueError if such a name is also the name of another group.
+        :param groups: Groups, by hashable key value. See :meth:`Filter.hashable`.
+        :type groups: dict
+        :return: Groups, by key value or JSON representation of the key value.
+        :rtype: dict
+        """
+        output = {}
+        for value, group in groups.items():
+            if isinstance(value, tuple) and len(value) == 2 and value[0] == "json":
+                value = value[1]
+                if value in groups:
+                    raise ValueError("Can not group both a string and a value with the "
+                                     "JSON representation {!r}".format(value))
+            output[value] = group
+        return output
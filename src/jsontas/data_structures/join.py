@@ -0,0 +1,143 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Join datastructure."""
+from .datastructure import DataStructure
+from .filter import Filter
+
+
+class Join(DataStructure):
+    """Join datastructure.
+
+    Join two lists of items on the value of a key in each item, using a hash join.
+    A hash table is built from the "right" items, which is then probed with each of
+    the "left" items, so the result is in the order of the "left" items.
+    Keys are looked up in each item the same way as in
+    :obj:`jsontas.data_structures.filter.Filter`, i.e. as "$item.<key>".
+
+    Example::
+
+        {
+            "data": {
+                "$join": {
+                    "left": [
+                        {"id": 1, "suite": "smoke"},
+                        {"id": 2, "suite": "nightly"}
+                    ],
+                    "right": [
+                        {"suite_id": 1, "status": "success"},
+                        {"suite_id": 1, "status": "failure"}
+                    ],
+                    "left_key": "id",
+                    "right_key": "suite_id"
+                }
+            }
+        }
+        # {
+        #     "data": [
+        #         {"id": 1, "suite": "smoke", "suite_id": 1, "status": "success"},
+        #         {"id": 1, "suite": "smoke", "suite_id": 1, "status": "failure"}
+        #     ]
+        # }
+
+    Parameters:
+
+    * :left, right: Lists of items to join.
+    * :key: Key to join on in both lists. Or "left_key" and "right_key" separately.
+    * :how: "inner" (default) for only items that match or "left" to also keep
+            "left" items without a match.
+    * :output: "merged" (default) to merge matching items into one dictionary, with
+               values from the "right" item taking precedence, or "paired" to output
+               {"left": item, "right": item}. Items that are not dictionaries are
+               always paired. A "left" item without a match is output as is when
+               merged and with a "right" of null when paired.
+
+    Key values of null never match.
+    """
+
+    deterministic = True
+    pure = True
+    __slots__ = ()
+    hows = ("inner", "left")
+    outputs = ("merged", "paired")
+
+    def __key(self, item, key):
+        """Get the value to join an item on.
+
+        :param item: Item to get the value from.
+        :type item: any
+        :param key: Key, or key path, in the item.
+        :type key: str
+        :return: Hashable join value.
+        :rtype: any
+        """
+        return Filter.hashable(Filter.item_value(self.dataset, item, key))
+
+    @staticmethod
+    def __merge(left, right, paired):
+        """Merge, or pair, a left and a right item.
+
+        :param left: Item from the left list.
+        :type left: any
+        :param right: Item from the right list.
+        :type right: any
+        :param paired: Whether to pair instead of merge.
+        :type paired: bool
+        :return: Joined item.
+        :rtype: dict
+        """
+        if paired or not isinstance(left, dict) or not isinstance(right, dict):
+            return {"left": left, "right": right}
+        merged = dict(left)
+        merged.update(right)
+        return merged
+
+    def execute(self):
+        """Execute the join datastructure.
+
+        :return: None and the joined items.
+        :rtype: tuple
+        """
+        left = self.data.get("left")
+        right = self.data.get("right")
+        left_key = self.data.get("left_key", self.data.get("key"))
+        right_key = self.data.get("right_key", self.data.get("key"))
+        how = self.data.get("how", "inner")
+        output = self.data.get("output", "merged")
+        if how not in self.hows:
+            raise ValueError("Unknown join: {!r}. Use one of {}".format(how, self.hows))
+        if output not in self.outputs:
+            raise ValueError("Unknown output: {!r}. Use one of {}".format(output, self.outputs))
+        joined = []
+        if not isinstance(left, (list, tuple)) or not isinstance(right, (list, tuple)):
+            return None, joined
+        if not isinstance(left_key, str) or not isinstance(right_key, str):
+            return None, joined
+        paired = output == "paired"
+
+        table = {}
+        for item in right:
+            value = self.__key(item, right_key)
+            if value is not None:
+                table.setdefault(value, []).append(item)
+
+        for item in left:
+            value = self.__key(item, left_key)
+            matches = table.get(value, []) if value is not None else []
+            for match in matches:
+                joined.append(self.__merge(item, match, paired))
+            if not matches and how == "left":
+                joined.append({"left": item, "right": None} if paired else item)
+        return None, joined
@@ -54,6 +54,9 @@ class List(DataStructure):
         }
     """
 
+    deterministic = True
+    __slots__ = ()
+
     @staticmethod
     def split(value):
         """Split a string on ':' and return first and second value.
@@ -50,22 +50,48 @@ class Operator(DataStructure):
     .. automethod:: _regex
     """
 
+    deterministic = True
+    pure = True
+    __slots__ = ("key", "value", "operator", "__operators")
+    # Names of the methods implementing each operator. See :attr:`operators`.
+    __names = {
+        "$eq": "_equal",
+        "$in": "_in",
+        "$notin": "_notin",
+        "$startswith": "_startswith",
+        "$regex": "_regex"
+    }
+
     def __init__(self, *args, **kwargs):
         """Initialize.
 
         See :obj:`jsontas.data_structures.datastructure.DataStructure`
         """
         super().__init__(*args, **kwargs)
-        self.operators = {
-            "$eq": self._equal,
-            "$in": self._in,
-            "$notin": self._notin,
-            "$startswith": self._startswith,
-            "$regex": self._regex
-        }
+        self.__operators = None
         self.key = self.data.get("key")
         self.value = self.data.get("value")
-        self.operator = self.operators.get(self.data.get("operator"))
+        operator = self.__names.get(self.data.get("operator"))
+        self.operator = getattr(self, operator) if operator is not None else None
+
+    @property
+    def operators(self):
+        """Methods implementing each operator, by operator.
+
+        Created when first used, and not for every operator instance, since only the
+        method of the operator being executed is needed. Subclasses can add operators
+        to it::
+
+            self.operators["$gt"] = self._greater_than
+
+        :return: Bound methods, by operator.
+        :rtype: dict
+        """
+        if self.__operators is None:
+            self.__operators = {
+                operator: getattr(self, name) for operator, name in self.__names.items()
+            }
+        return self.__operators
 
     def _equal(self):
         """Operator '=='.
@@ -169,6 +195,8 @@ class Operator(DataStructure):
         :return: None and whether key matches value or not.
         :rtype: tuple
         """
+        if self.operator is None and self.__operators is not None:
+            self.operator = self.__operators.get(self.data.get("operator"))
         if self.operator is None:
             raise Exception("Unknown operator: %r" % self.operator)
         try:
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Reduce datastructure."""
+from copy import copy
 from jsontas.data_structures.datastructure import DataStructure
 
 # pylint:disable=too-few-public-methods
@@ -45,9 +46,46 @@ class Reduce(DataStructure):
                 "element 2"
             ]
         }
-    
+
+    If the list is a '$filter' or an '$expand', the reduction is pushed down to it
+    as a 'limit', so that no more items than necessary are filtered or expanded.
     """
 
+    deterministic = True
+    pure = True
+    __slots__ = ()
+    producers = ("$filter", "$expand")
+
+    @classmethod
+    def rewrite(cls, data):
+        """Push the reduction down into a '$filter' or '$expand' list.
+
+        :param data: Unresolved parameters of reduce.
+        :type data: dict
+        :return: Parameters with a limit added to the list, if possible.
+        :rtype: dict
+        """
+        _list = data.get("list")
+        reduce_to_value = data.get("to", 1)
+        # pylint: disable=unidiomatic-typecheck
+        if type(reduce_to_value) != int or reduce_to_value < 0:
+            return data
+        if not isinstance(_list, dict) or len(_list) != 1:
+            return data
+        key, producer = next(iter(_list.items()))
+        if key not in cls.producers or not isinstance(producer, dict):
+            return data
+        limit = producer.get("limit")
+        if type(limit) == int and 0 <= limit <= reduce_to_value:
+            return data
+        producer = copy(producer)
+        producer["limit"] = reduce_to_value
+        _list = copy(_list)
+        _list[key] = producer
+        data = copy(data)
+        data["list"] = _list
+        return data
+
     def execute(self):
         """Execute reduce.
 
@@ -15,12 +15,20 @@
 # limitations under the License.
 """Request datastructure."""
 import time
+import threading
+from http.cookiejar import DefaultCookiePolicy
 from json import JSONDecodeError
 import traceback
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth, HTTPDigestAuth
+from jsontas.memo import freeze
 from .datastructure import DataStructure
 
+SESSIONS = threading.local()
+# Connection pools shared by the sessions of all threads, see :meth:`Request.session`.
+ADAPTER = HTTPAdapter()
+
 
 class Request(DataStructure):
     """HTTP request datastructure.
@@ -73,8 +81,13 @@ class Request(DataStructure):
             },
             "text": "world"
         }
+
+    If the dataset has a 'responses' cache (see :obj:`jsontas.dataset.Dataset`), successful
+    GET requests are cached in it and identical GET requests are not made again.
     """
 
+    __slots__ = ()
+
     @staticmethod
     def wait(method, timeout=None, interval=5, **kwargs):
         """Iterate over result from method call.
@@ -98,6 +111,28 @@ class Request(DataStructure):
                 traceback.print_exc()
             time.sleep(interval)
 
+    @staticmethod
+    def session():
+        """Get the HTTP session of the current thread.
+
+        Sessions are kept per thread, since sessions are not thread-safe, but all of them
+        share the same, thread-safe, connection pools. Connections are therefore reused
+        between requests, runs and threads, e.g. when each request to 'jsontas serve' is
+        handled by a new thread. Cookies are never stored in the session, so that
+        requests stay independent of each other.
+
+        :return: HTTP session for this thread.
+        :rtype: :obj:`requests.Session`
+        """
+        session = getattr(SESSIONS, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            session.mount("http://", ADAPTER)
+            session.mount("https://", ADAPTER)
+            SESSIONS.session = session
+        return session
+
     @staticmethod
     def __auth(username, password, type="basic"):  # pylint:disable=redefined-builtin
         """Create an authentication for HTTP request.
@@ -136,18 +171,36 @@ class Request(DataStructure):
         if requests_parameters.get("auth"):
             requests_parameters["auth"] = self.__auth(**requests_parameters["auth"])
 
-        request = getattr(requests, method.lower())
+        request = getattr(self.session(), method.lower())
         requests_parameters["url"] = url
         requests_parameters["json"] = json
         requests_parameters["headers"] = headers
         return self.wait(request, **requests_parameters)
 
+    def __cache_key(self):
+        """Key of this request in the 'responses' cache of the dataset.
+
+        :return: Cache key, or None if this request must not be cached.
+        :rtype: tuple or None
+        """
+        if self.dataset.responses is None or str(self.data.get("method")).upper() != "GET":
+            return None
+        try:
+            return freeze(self.data)
+        except TypeError:
+            return None
+
     def execute(self):
         """Execute data.
 
         :return: None and response as JSON (or None).
         :rtype: Tuple
         """
+        key = self.__cache_key()
+        if key is not None and key in self.dataset.responses:
+            data = dict(self.dataset.responses[key])
+            self.dataset.add("response", data)
+            return None, data
         response_generator = self.request(**self.data)
         response = None
         data = None
@@ -174,5 +227,7 @@ class Request(DataStructure):
                 except JSONDecodeError:
                     pass
             break
+        if key is not None and data is not None and data["ok"]:
+            self.dataset.responses[key] = dict(data)
         self.dataset.add("response", data)
         return None, data
@@ -81,6 +81,8 @@ class Wait(DataStructure):
     'items' key from the response. Maximum 1 request/s for 20s
     """
 
+    __slots__ = ()
+
     @staticmethod
     def wait(method, timeout, interval, **kwargs):
         """Iterate over result from method call.
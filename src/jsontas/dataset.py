@@ -16,33 +16,74 @@
 """Dataset module."""
 import re
 import logging
-import traceback
-import inspect
-from copy import deepcopy
-from jsontas.data_structures import Condition, Operator, List, Request, Filter, From, Expand, Wait, Reduce
-from jsontas.data_structures.datastructure import DataStructure
+import sys
+from types import FunctionType
+from collections import ChainMap
+from copy import copy, deepcopy
+from jsontas import data_structures
+from jsontas.data_structures.list import List
 
 
 class Dataset:
     """JSONTas dataset object. Used for lookup of $ notated strings in a JSON file."""
 
     logger = logging.getLogger("Dataset")
-    # Split value into words separated by anything except ','
-    regex = re.compile(r"[\$\-\w!,:]+")
-
-    def __init__(self):
-        """Create an initial dataset of the data structures."""
-        self.__dataset = {
-            "condition": Condition,
-            "operator": Operator,
-            "list": List,
-            "request": Request,
-            "filter": Filter,
-            "expand": Expand,
-            "from": From,
-            "wait": Wait,
-            "reduce": Reduce
-        }
+    # Split value into words separated by anything except ',' and projections, '[*]' and '{*}'
+    regex = re.compile(r"\[\*\]|\{\*\}|[\$\-\w!,:]+")
+    # Project the rest of a query onto each item in a list, as rows or as columns.
+    projections = ("[*]", "{*}")
+    # Keys that JSONTas, and its datastructures, add to the context of each run.
+    run_scoped = frozenset(("this", "query_tree", "previous", "item", "response",
+                            "expand_index", "expand_value"))
+    # Accessors, by type of datasubset. See :meth:`get_or_getattr`.
+    __accessors = {}
+
+    def __init__(self, memo=None):
+        """Create an initial, empty, dataset.
+
+        The data structures are not part of the dataset itself but are loaded when first
+        looked up, see :obj:`jsontas.data_structures.DATA_STRUCTURES`. They can be overridden
+        by adding a value with the same name to the dataset.
+
+        :param memo: Cache for results of pure datastructures. Disabled if None.
+        :type memo: :obj:`jsontas.memo.Memo`
+        """
+        self.__dataset = {}
+        self.memo = memo
+        # Errors are recorded here instead of logged, if set. See :obj:`jsontas.diagnostics`.
+        self.diagnostics = None
+        # Whether to log debug messages. Checked once per run, see :meth:`context`.
+        self.debug = self.logger.isEnabledFor(logging.DEBUG)
+        # Indexes built by datastructures, see :obj:`jsontas.data_structures.filter.Filter`.
+        self.indexes = {}
+        # Functions called with the key of each value added or removed.
+        # See :obj:`jsontas.incremental`.
+        self.observers = []
+        # Names of all values looked up, that were not added before, if set. Shared with
+        # all contexts of this dataset, like 'writes'. See :obj:`jsontas.incremental`.
+        self.reads = None
+        # Names of all values added, if set.
+        self.writes = None
+        # Responses of GET requests, by request, if set. See :obj:`jsontas.data_structures.request`.
+        self.responses = None
+
+    def context(self):
+        """Create a run-scoped context on top of this dataset.
+
+        Resolution state, such as 'this', 'query_tree', 'previous', 'item', 'response' and
+        'expand_index' (see :obj:`run_scoped`), is added to the context instead of to the
+        shared dataset. The shared dataset is only read from, which makes it possible to
+        share a single dataset between several concurrent runs.
+
+        :return: A dataset object that reads from this dataset and writes to its own layer.
+        :rtype: :obj:`Dataset`
+        """
+        context = copy(self)
+        context.__dataset = ChainMap({}, self.__dataset)
+        context.indexes = {}
+        context.debug = self.logger.isEnabledFor(logging.DEBUG)
+        context.observers = []
+        return context
 
     def add(self, key, value):
         """Add a new dataset value and key.
@@ -53,6 +94,35 @@ class Dataset:
         :type value: any
         """
         self.__dataset[key] = value
+        if self.writes is not None:
+            self.writes.add(key)
+        if self.observers:
+            self.__notify((key,))
+
+    def remove(self, key):
+        """Remove a dataset value, if there is one.
+
+        A context only removes values added to it, see :meth:`context`.
+
+        :param key: Dictionary key for global dataset dict.
+        :type key: str
+        """
+        try:
+            del self.__dataset[key]
+        except KeyError:
+            return
+        if self.observers:
+            self.__notify((key,))
+
+    def __notify(self, keys):
+        """Tell all observers which keys have been added or removed.
+
+        :param keys: Keys that have been added or removed.
+        :type keys: iterable
+        """
+        for observer in self.observers:
+            for key in keys:
+                observer(key)
 
     def merge(self, dataset):
         """Merge a dataset with this dataset.
@@ -61,6 +131,10 @@ class Dataset:
         :type dataset: dict
         """
         self.__dataset.update(**dataset)
+        if self.writes is not None:
+            self.writes.update(dataset)
+        if self.observers:
+            self.__notify(dataset)
 
     def copy(self):
         """Make a copy of this dataset.
@@ -68,7 +142,7 @@ class Dataset:
         :return: A dataset object with a copy of the internal dataset in it.
         :rtype: :obj:`Dataset`
         """
-        copied_dataset = deepcopy(self.__dataset)
+        copied_dataset = deepcopy(dict(self.__dataset))
         copy = Dataset()
         copy.merge(copied_dataset)
         return copy
@@ -83,43 +157,230 @@ class Dataset:
         :return: Value from key in global dataset dictionary or default.
         :rtype: any
         """
-        return self.__dataset.get(key, default)
+        try:
+            return self.__dataset[key]
+        except KeyError:
+            pass
+        datastructure = data_structures.load(key)
+        if datastructure is None:
+            return default
+        return datastructure
 
-    def __iterate(self, key):
-        """Create an iterator from dataset regex against a JSONTas query string.
+    def __split(self, key):
+        """Split a JSONTas query string into words using the dataset regex.
 
         :param key: JSONTas query string to evaluate.
         :type key: str
-        :return: Generator for all values in JSONTas query string.
-        :rtype: generator
+        :return: All words in JSONTas query string.
+        :rtype: list
         """
         values = self.regex.findall(key)
-        self.logger.debug("Query split : %r", values)
-        yield from values
+        if self.debug:
+            self.logger.debug("Query split : %r", values)
+        return values
 
-    def get_or_getattr(self, datasubset, key):
-        """Get a key from a datasubset. Either using 'get' or 'getattr'.
+    @staticmethod
+    def __get_item(datasubset, key):
+        """Get a key from a dictionary.
 
-        :raises: AttributeError if attribute could not be found with either 'get' or 'getattr'.
-        :param datasubset: Dataset to attempt to get key from.
+        :param datasubset: Dictionary to get key from.
+        :type datasubset: dict
+        :param key: Key to get.
+        :type key: str
+        :return: Value from key or None.
+        :rtype: any
+        """
+        return dict.get(datasubset, key)
+
+    @staticmethod
+    def __get_index(datasubset, key):
+        """Get an index, or a slice, from a list. See :obj:`jsontas.data_structures.list.List`.
+
+        Keys that are not indexes are attributes of the list, e.g. 'count'.
+
+        :raises: IndexError if index is out of range.
+        :param datasubset: List to get index from.
+        :type datasubset: list, set or tuple
+        :param key: Index, slice or attribute to get.
+        :type key: str
+        :return: Value from index or None.
+        :rtype: any
+        """
+        if ":" in key:
+            return List.slice(datasubset, *List.split(key))
+        if key[-1:].isdigit():
+            try:
+                return List.index(datasubset, int(key))
+            except ValueError:
+                pass
+        return getattr(datasubset, key, None)
+
+    @staticmethod
+    def __get_any(datasubset, key):
+        """Get a key from any object with a 'get' method, falling back to 'getattr'.
+
+        :param datasubset: Object to get key from.
         :type datasubset: any
         :param key: Key to get.
-        :type key: any
-        :return: Value from key.
+        :type key: str
+        :return: Value from key or None.
         :rtype: any
         """
         try:
-            if isinstance(datasubset, (list, set, tuple)):
-                _, value = List(key, datasubset, self).execute()
-            else:
-                value = datasubset.get(key)
+            return datasubset.get(key)
         except (AttributeError, ValueError):
-            if hasattr(datasubset, key):
-                value = getattr(datasubset, key)
+            return getattr(datasubset, key, None)
+
+    @staticmethod
+    def __get_attribute(datasubset, key):
+        """Get an attribute from a string, which never has a 'get' method.
+
+        :param datasubset: Object to get attribute from.
+        :type datasubset: any
+        :param key: Attribute to get.
+        :type key: str
+        :return: Value from attribute or None.
+        :rtype: any
+        """
+        return getattr(datasubset, key, None)
+
+    @classmethod
+    def __accessor(cls, kind):
+        """Pick the accessor for a type of datasubset.
+
+        :param kind: Type of datasubset.
+        :type kind: type
+        :return: Accessor function, taking a datasubset and a key.
+        :rtype: function
+        """
+        # Only built-in types are sure to get, or not get, 'get' from their type. Any
+        # other object may have a 'get' of its own, or one from '__getattr__'.
+        if kind is dict:
+            return cls.__get_item
+        if issubclass(kind, (list, set, tuple)):
+            return cls.__get_index
+        if kind is str:
+            return cls.__get_attribute
+        return cls.__get_any
+
+    def __walk(self, value, path):
+        """Walk a path of keys from a value, like a lookup, without executing anything.
+
+        :param value: Value to start from.
+        :type value: any
+        :param path: Keys to walk.
+        :type path: list
+        :return: Value at the end of the path or None.
+        :rtype: any
+        """
+        for index, key in enumerate(path):
+            if key in self.projections:
+                return self.__project(value, path[index + 1:], key == "{*}")
+            if type(value) is dict:  # pylint:disable=unidiomatic-typecheck
+                value = value.get(key)
             else:
-                value = None
+                value = self.get_or_getattr(value, key)
         return value
 
+    def __walk_all(self, items, path):
+        """Walk a path of keys from each item in a list. See :meth:`__walk`.
+
+        :param items: Items to start from.
+        :type items: list, set or tuple
+        :param path: Keys to walk.
+        :type path: list
+        :return: Value at the end of the path, for each item.
+        :rtype: list
+        """
+        if any(key in self.projections for key in path):
+            return [self.__walk(item, path) for item in items]
+        values = []
+        append = values.append
+        get_or_getattr = self.get_or_getattr
+        for value in items:
+            for key in path:
+                if type(value) is dict:  # pylint:disable=unidiomatic-typecheck
+                    value = value.get(key)
+                else:
+                    value = get_or_getattr(value, key)
+            append(value)
+        return values
+
+    def __project(self, datasubset, path, columnar=False):
+        """Project a path onto each item of a list, in a single pass.
+
+        Used for '[*]', which gives a list with a value for each item (rows), and for
+        '{*}', which turns a list of dictionaries into a dictionary of lists (columns).
+        E.g. '$items[*].metadata.name' or '$items{*}.metadata'.
+
+        :param datasubset: List to project the path onto.
+        :type datasubset: list, set or tuple
+        :param path: Keys to walk from each item.
+        :type path: list
+        :param columnar: Return a dictionary with a list for each key, if the values are
+                         dictionaries.
+        :type columnar: bool
+        :return: Projected values or None if datasubset is not a list.
+        :rtype: list or dict
+        """
+        if not isinstance(datasubset, (list, set, tuple)):
+            return None
+        rows = self.__walk_all(datasubset, path)
+        if not columnar or not any(isinstance(row, dict) for row in rows):
+            return rows
+        keys = dict.fromkeys(key for row in rows if isinstance(row, dict) for key in row)
+        return {key: [row.get(key) if isinstance(row, dict) else None for row in rows]
+                for key in keys}
+
+    def __fan_out(self, words, position):
+        """Find how many words, from a position, can be walked for each item in a list.
+
+        When a key is not found in a list it is looked up in each item of the list instead.
+        Following keys, that are not indexes, slices or attributes of a list, would be
+        looked up in each item as well, so they can all be walked in a single pass.
+
+        :param words: All words in the query string.
+        :type words: list
+        :param position: Position of the key that was not found in the list.
+        :type position: int
+        :return: Position after the last word to walk.
+        :rtype: int
+        """
+        end = position + 1
+        while end < len(words):
+            word = words[end]
+            if word in self.projections or ":" in word or hasattr(list, word):
+                break
+            if word[-1:].isdigit():
+                try:
+                    int(word)
+                    break
+                except ValueError:
+                    pass
+            end += 1
+        return end
+
+    def get_or_getattr(self, datasubset, key):
+        """Get a key from a datasubset. Either using 'get', 'getattr' or an index.
+
+        The way to get a key is picked once per type of datasubset, so that dictionaries,
+        lists and strings are accessed directly, without any exceptions. Other objects
+        are asked for the key with their 'get' method, if they have one, and with
+        'getattr' otherwise.
+
+        :param datasubset: Dataset to attempt to get key from.
+        :type datasubset: any
+        :param key: Key to get.
+        :type key: str
+        :return: Value from key or None if it could not be found.
+        :rtype: any
+        """
+        kind = type(datasubset)
+        accessor = self.__accessors.get(kind)
+        if accessor is None:
+            accessor = self.__accessors[kind] = self.__accessor(kind)
+        return accessor(datasubset, key)
+
     def lookup(self, query_string, parameters):
         """Lookup JSONTas query string against dataset.
 
@@ -133,6 +394,10 @@ class Dataset:
         These keywords are then matched against the dataset very simply
 
         1. Try to get keyword from dataset, either via ".get" or "getattr".
+           If the keyword is not found in a list, it is looked up in each item of the list.
+           The keyword '[*]' looks up the rest of the query string in each item of a list
+           and '{*}' does the same, but turns a list of dictionaries into a dictionary
+           of lists.
         2. If keyword exists, inspect what the type of the keyword value is.
         3. If it's a :obj:`jsontas.data_structures.datastructure.DataStructure`, call its 'execute'
            method with the parameters and keyword value.
@@ -196,47 +461,83 @@ class Dataset:
         :return: New key and value as defined by dataset.
         :rtype: tuple
         """
-        self.logger.debug("Query string: %r", query_string)
-        self.logger.debug("Parameters  : %r", parameters)
+        debug = self.debug
+        if debug:
+            self.logger.debug("Query string: %r", query_string)
+            self.logger.debug("Parameters  : %r", parameters)
         value = None
         key = query_string
         datasubset = self.__dataset
-        iterator = self.__iterate(query_string[1:])
+        words = self.__split(query_string[1:])
+        position = 0
+        jsonkey = None
         try:
-            for jsonkey in iterator:
-                self.logger.debug("Datasubset  : %r", datasubset)
-                self.logger.debug("Evaluating  : %r", jsonkey)
-                value = self.get_or_getattr(datasubset, jsonkey)
-                self.logger.debug("Value       : %r", value)
+            while position < len(words):
+                jsonkey = words[position]
+                position += 1
+                if debug:
+                    self.logger.debug("Datasubset  : %r", datasubset)
+                    self.logger.debug("Evaluating  : %r", jsonkey)
+                if datasubset is self.__dataset:
+                    if self.reads is not None and not (self.writes and jsonkey in self.writes):
+                        self.reads.add(jsonkey)
+                    value = self.get(jsonkey)
+                elif jsonkey in self.projections:
+                    if debug:
+                        self.logger.debug("Projecting rest of query onto list.")
+                    value = self.__project(datasubset, words[position:], jsonkey == "{*}")
+                    position = len(words)
+                else:
+                    value = self.get_or_getattr(datasubset, jsonkey)
+                if debug:
+                    self.logger.debug("Value       : %r", value)
                 if value is None and isinstance(datasubset, (list, set, tuple)):
-                    self.logger.debug("Getting attributes from list.")
-                    value = [self.get_or_getattr(list_value, jsonkey)
-                             for list_value in datasubset]
-                    if all([item is None for item in value]):
-                        self.logger.debug("All attributes are None.")
-                        self.logger.debug("Exiting lookup.")
+                    if debug:
+                        self.logger.debug("Getting attributes from list.")
+                    end = self.__fan_out(words, position - 1)
+                    path = words[position - 1:end]
+                    position = end
+                    value = self.__walk_all(datasubset, path)
+                    if all(item is None for item in value):
+                        if debug:
+                            self.logger.debug("All attributes are None.")
+                            self.logger.debug("Exiting lookup.")
                         value = None
                         key = None
                         break
                 elif value is None:
-                    self.logger.debug("Exiting lookup.")
+                    if debug:
+                        self.logger.debug("Exiting lookup.")
                     key = query_string
                     break
 
-                # pylint: disable=unidiomatic-typecheck
+                kind = type(value)
                 # Since value is never an instance at this point, a type check is mandatory.
-                if inspect.isclass(value) and type(value) == type(DataStructure):
-                    self.logger.debug("Evaluating value as DataStructure")
-                    key, value = value(jsonkey, datasubset, self, **parameters).execute()
-                elif inspect.isfunction(value):
-                    self.logger.debug("Evaluating value as function")
+                if kind is type:
+                    if debug:
+                        self.logger.debug("Evaluating value as DataStructure")
+                    if self.memo is not None and getattr(value, "pure", False):
+                        key, value = self.memo.execute(value, jsonkey, datasubset, self,
+                                                       parameters)
+                    else:
+                        key, value = value(jsonkey, datasubset, self, **parameters).execute()
+                elif kind is FunctionType:
+                    if debug:
+                        self.logger.debug("Evaluating value as function")
                     key, value = value(jsonkey, datasubset, self, **parameters)
                 else:
-                    self.logger.debug("Continue with datasubset as value.")
+                    if debug:
+                        self.logger.debug("Continue with datasubset as value.")
                     key = None
                     datasubset = value
         except:  # noqa, pylint:disable=bare-except
-            self.logger.warning(traceback.format_exc())
-        self.logger.debug("Returning   : %r, %r", key, value)
+            if self.diagnostics is not None:
+                self.diagnostics.record(query_string, jsonkey, sys.exc_info()[1])
+            else:
+                # The traceback is only formatted if the warning is logged.
+                self.logger.warning("Lookup of %r failed at %r.", query_string, jsonkey,
+                                    exc_info=True)
+        if debug:
+            self.logger.debug("Returning   : %r, %r", key, value)
         self.add("previous", value)
         return key, value
@@ -0,0 +1,76 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Diagnostics module."""
+import traceback
+
+
+class Diagnostics:
+    """Collection of errors from a JSONTas run.
+
+    By default, a failing lookup logs a warning with a full traceback. If a
+    diagnostics object is supplied to the run, failing lookups are recorded
+    in it instead, which is much cheaper when many lookups fail::
+
+        diagnostics = Diagnostics()
+        JsonTas().run(json_data=json_data, diagnostics=diagnostics)
+        print(diagnostics.summary())
+
+    Each error is recorded as the query string, the key in the query string that
+    failed and the type and message of the exception. Tracebacks are only formatted
+    if 'tracebacks' is True.
+    """
+
+    def __init__(self, tracebacks=False):
+        """Initialize diagnostics.
+
+        :param tracebacks: Whether to record the full traceback of each error.
+        :type tracebacks: bool
+        """
+        self.tracebacks = tracebacks
+        self.errors = []
+
+    def record(self, query_string, jsonkey, exception):
+        """Record an error from a lookup. Must be called from an 'except' block.
+
+        :param query_string: JSONTas query string that failed.
+        :type query_string: str
+        :param jsonkey: Key, in the query string, that failed.
+        :type jsonkey: str
+        :param exception: Exception raised.
+        :type exception: :obj:`BaseException`
+        """
+        error = {
+            "query": query_string,
+            "key": jsonkey,
+            "type": type(exception).__name__,
+            "message": str(exception)
+        }
+        if self.tracebacks:
+            error["traceback"] = traceback.format_exc()
+        self.errors.append(error)
+
+    def summary(self):
+        """Summary of all errors recorded.
+
+        :return: Number of errors, in total, by exception type and by query string.
+        :rtype: dict
+        """
+        types = {}
+        queries = {}
+        for error in self.errors:
+            types[error["type"]] = types.get(error["type"], 0) + 1
+            queries[error["query"]] = queries.get(error["query"], 0) + 1
+        return {"errors": len(self.errors), "types": types, "queries": queries}
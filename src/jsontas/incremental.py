@@ -0,0 +1,224 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Incremental resolution module."""
+import logging
+from jsontas.template import Template
+
+
+class Incremental:
+    """Keep a resolved JSON structure up to date with changes to its dataset.
+
+    Each top-level key of the JSON data is resolved separately, while recording
+    the names of the dataset values that it looks up. When values are added to
+    the dataset, with :meth:`jsontas.dataset.Dataset.add` or
+    :meth:`jsontas.dataset.Dataset.merge`, or removed from it with
+    :meth:`jsontas.dataset.Dataset.remove`, :meth:`update` resolves only the
+    top-level keys that looked them up and patches the output in place::
+
+        incremental = Incremental(jsontas, json_data)
+        output = incremental.run()
+        jsontas.dataset.add("environment", {"version": "2"})
+        incremental.update()  # Only keys that read '$environment' are resolved.
+
+    The JSON data itself can be replaced with :meth:`edit`, after which :meth:`update`
+    resolves only the top-level keys that were added or changed.
+
+    Keys can also read run-scoped values, such as 'item' or 'response', that an earlier
+    key added while it was resolved. Such keys are always resolved together with the
+    key that added the value, in order, and whenever either of them is resolved.
+
+    Keys that look up '$this' or '$previous' depend on the rest of the JSON data, so
+    if there are any such keys, everything is resolved again. The same goes for JSON
+    data with a JSONTas query as a top-level key. Changes made to dataset values in
+    place, without adding them again, are not detected.
+    """
+
+    logger = logging.getLogger("Incremental")
+    # Lookups that depend on the whole JSON data and not only on the dataset.
+    global_names = frozenset(("this", "previous"))
+
+    def __init__(self, jsontas, json_data):
+        """Start observing the dataset of a JSONTas resolver.
+
+        :param jsontas: JSONTas resolver to resolve the JSON data with.
+        :type jsontas: :obj:`jsontas.jsontas.JsonTas`
+        :param json_data: JSON data, or compiled template, to keep resolved.
+                          It is never modified.
+        :type json_data: dict or :obj:`jsontas.template.Template`
+        """
+        self.jsontas = jsontas
+        self.template = json_data if isinstance(json_data, Template) else Template(json_data)
+        self.json_data = self.template.json_data
+        self.output = None
+        self.__reads = {}
+        self.__writes = {}
+        self.__changed = set()
+        self.__edited = set()
+        self.jsontas.dataset.observers.append(self.__observe)
+
+    def __observe(self, key):
+        """Record that a dataset value has been added or removed.
+
+        :param key: Name of the dataset value.
+        :type key: str
+        """
+        self.__changed.add(key)
+
+    def close(self):
+        """Stop observing the dataset."""
+        if self.__observe in self.jsontas.dataset.observers:
+            self.jsontas.dataset.observers.remove(self.__observe)
+
+    def edit(self, json_data):
+        """Replace the JSON data with a new version of it.
+
+        Top-level keys that are new, or whose JSON data has changed, are resolved
+        by the next :meth:`update`. Removed keys are removed from the output.
+
+        :param json_data: New JSON data, or compiled template, to keep resolved.
+        :type json_data: dict or :obj:`jsontas.template.Template`
+        """
+        old = self.json_data
+        self.template = json_data if isinstance(json_data, Template) else Template(json_data)
+        self.json_data = json_data = self.template.json_data
+        for key, value in json_data.items():
+            if key not in old or old[key] != value:
+                self.__edited.add(key)
+        for key in old:
+            if key not in json_data:
+                self.__reads.pop(key, None)
+                writes = self.__writes.pop(key, frozenset())
+                # Keys that read values added by the removed key must be resolved again.
+                self.__edited.update(other for other, reads in self.__reads.items()
+                                     if reads & writes)
+                if isinstance(self.output, dict):
+                    self.output.pop(key, None)
+
+    def __resolve(self, json_data):
+        """Resolve JSON data one top-level key at a time, recording what each key reads.
+
+        The JSON data is resolved as is, and not as a compiled template, since reusing
+        common subtrees would skip their lookups, and with them what they read.
+
+        :param json_data: JSON data to resolve.
+        :type json_data: dict
+        :return: Generator of resolved top-level keys and values.
+        :rtype: generator
+        """
+        dataset = self.jsontas.dataset
+        dataset.reads = set()
+        dataset.writes = set()
+        try:
+            for key, value in self.jsontas.stream(json_data=json_data, readonly=True):
+                self.__reads[key] = frozenset(dataset.reads)
+                self.__writes[key] = frozenset(dataset.writes)
+                dataset.reads.clear()
+                dataset.writes.clear()
+                yield key, value
+        finally:
+            dataset.reads = None
+            dataset.writes = None
+
+    def __together(self, keys):
+        """Find the top-level keys that must be resolved together with some keys.
+
+        A key that reads a value which it did not add itself, reads the value added by
+        the last key before it that added it. Those two keys are resolved together, so
+        that the value is there to be read, and so that the reader sees a new value.
+
+        :param keys: Top-level keys to resolve.
+        :type keys: iterable
+        :return: The keys, and all keys they are resolved together with, in order.
+        :rtype: list
+        """
+        linked = {}
+        added_by = {}
+        for key in self.json_data:
+            for name in self.__reads.get(key, frozenset()):
+                if name in added_by:
+                    linked.setdefault(key, set()).add(added_by[name])
+                    linked.setdefault(added_by[name], set()).add(key)
+            for name in self.__writes.get(key, frozenset()):
+                added_by[name] = key
+        together = set(keys)
+        stack = list(together)
+        while stack:
+            for other in linked.get(stack.pop(), ()):
+                if other not in together:
+                    together.add(other)
+                    stack.append(other)
+        return [key for key in self.json_data if key in together]
+
+    def run(self):
+        """Resolve all of the JSON data.
+
+        :return: Resolved JSON structure.
+        :rtype: dict
+        """
+        self.__changed.clear()
+        self.__edited.clear()
+        self.__reads.clear()
+        self.__writes.clear()
+        self.output = self.json_data.__class__()
+        for key, value in self.__resolve(self.json_data):
+            if key is None:
+                self.output = value
+            else:
+                self.output[key] = value
+        return self.output
+
+    def update(self):
+        """Resolve the top-level keys that were edited, or that depend on dataset values
+        added or removed, since last time.
+
+        :return: Top-level keys that were resolved again.
+        :rtype: list
+        """
+        if self.output is None:
+            self.run()
+            return list(self.json_data)
+        changed = frozenset(self.__changed)
+        edited = self.__edited
+        self.__changed = set()
+        self.__edited = set()
+        keys = [key for key in self.json_data
+                if key in edited or self.__reads.get(key, frozenset()) & changed]
+        if not keys:
+            return []
+        if (None in self.__reads or not isinstance(self.output, dict)
+                or any(isinstance(key, str) and key.startswith("$") for key in self.json_data)
+                or self.template.names & self.global_names):
+            self.logger.info("Resolving all JSON data, since %r changed.",
+                             sorted(changed | edited, key=str))
+            self.run()
+            return list(self.json_data)
+        keys = self.__together(keys)
+        self.logger.info("Resolving %r, since %r changed.", keys, sorted(changed | edited, key=str))
+        resolved = set()
+        while not resolved.issuperset(keys):
+            # Keys can start reading, or adding, other values than last time. If so,
+            # resolve them again together with the keys that they are now linked to.
+            subset = self.json_data.__class__((key, self.json_data[key]) for key in keys)
+            for key, value in self.__resolve(subset):
+                self.output[key] = value
+            resolved = set(keys)
+            keys = self.__together(keys)
+        if list(self.output) != list(self.json_data):
+            # Keep the output in the same order as the JSON data.
+            items = [(key, self.output[key]) for key in self.json_data]
+            self.output.clear()
+            self.output.update(items)
+        return keys
@@ -14,17 +14,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """JSONTas module."""
-import json
 import logging
-from collections import OrderedDict
-from copy import deepcopy
+from copy import copy
+from jsontas import codec
+from jsontas.cache import MISSING
 from jsontas.dataset import Dataset
+from jsontas.template import Template
+from jsontas.data_structures.datastructure import DataStructure
+
+
+class Frame:
+    """A dictionary or list that is being resolved, on the stack of the JSONTas resolver."""
+
+    __slots__ = ("json_data", "query_tree", "group", "scratch", "is_dict", "items", "new", "key")
+
+    def __init__(self, json_data, query_tree, group=None, scratch=None):
+        """Initialize frame.
+
+        :param json_data: JSON dictionary or list to resolve.
+        :type json_data: dict, list, set or tuple
+        :param query_tree: Query tree of the JSON data.
+        :type query_tree: any
+        :param group: Common subtree group of the JSON data, if any.
+        :type group: int
+        :param scratch: Where resolved values are written back to. The JSON data itself
+                        if None.
+        :type scratch: dict or list
+        """
+        self.json_data = json_data
+        self.query_tree = query_tree
+        self.group = group
+        self.scratch = json_data if scratch is None else scratch
+        self.is_dict = isinstance(json_data, dict)
+        if self.is_dict:
+            self.items = iter(json_data.items())
+            self.new = json_data.__class__()
+        else:
+            self.items = enumerate(json_data)
+            self.new = []
+        self.key = None
 
 
 class JsonTas:
     """JSONTas resolver."""
 
     logger = logging.getLogger("JSONTas")
+    # Run-scoped values that the resolver adds itself, rather than lookups or datastructures.
+    resolver_scoped = frozenset(("this", "query_tree"))
 
     def __init__(self, dataset=None):
         """Initialize dataset.
@@ -36,6 +72,14 @@ class JsonTas:
             self.dataset = dataset
         else:
             self.dataset = Dataset()
+        # Common subtrees, by id, and their results. See :meth:`__find_common`.
+        self.__common = {}
+        self.__results = {}
+        # Read-only resolution and prepared scratch copies, by id. See :meth:`run`.
+        self.__readonly = False
+        self.__scratch = {}
+        # Whether to log debug messages. Checked once per run, see :meth:`bind`.
+        self.__debug = self.logger.isEnabledFor(logging.DEBUG)
 
     @staticmethod
     def __get_key(key, dictionary):
@@ -71,119 +115,459 @@ class JsonTas:
         value = None
         key = query_string
         if isinstance(query_string, str) and query_string.startswith("$"):
-            self.logger.debug("Executing JSONTas query %r", query_string)
+            if self.__debug:
+                self.logger.debug("Executing JSONTas query %r", query_string)
             parameters = self.__get_key(query_string, parent)
             key, value = self.dataset.lookup(query_string, parameters)
         return key, value
 
-    def __resolve_dict(self, json_data, query_tree):
-        """Resolve a dictionary in the JSONTas resolver.
+    def __rewrite(self, query_string, parameters):
+        """Let a datastructure rewrite its parameters before they are resolved.
+
+        See :meth:`jsontas.data_structures.datastructure.DataStructure.rewrite`.
+
+        :param query_string: Query string that the parameters belong to.
+        :type query_string: str
+        :param parameters: Unresolved parameters 'below' the query string.
+        :type parameters: dict
+        :return: Parameters to resolve.
+        :rtype: dict
+        """
+        datastructure = self.dataset.get(query_string[1:])
+        # pylint: disable=unidiomatic-typecheck
+        if type(datastructure) == type(DataStructure) and issubclass(datastructure, DataStructure):
+            return datastructure.rewrite(parameters)
+        return parameters
+
+    def __resolve_item(self, json_data, query_tree, key, value):
+        """Resolve a dictionary key, after its value has been resolved.
+
+        :param json_data: JSON dictionary that the key belongs to.
+        :type json_data: dict
+        :param query_tree: Query tree of the JSON dictionary.
+        :type query_tree: dict
+        :param key: Key to resolve.
+        :type key: any
+        :param value: Resolved value of the key.
+        :type value: any
+        :return: New key and value. A key of None means that the value replaces the
+                 whole dictionary.
+        :rtype: tuple
+        """
+        json_data[key] = value
+        self.dataset.add("query_tree", query_tree[key])
+        if not isinstance(key, str) or not key.startswith("$"):
+            return key, value
+        key, new_value = self.__resolve(key, json_data)
+        if key is None or new_value is not None:
+            return key, new_value
+        return key, value
+
+    def __iterate_dict(self, json_data, query_tree):
+        """Resolve a dictionary in the JSONTas resolver, one key at a time.
 
-        Create a new dictionary.
         Iterate through all json_data items.
-        Resolve all items and add to new dictionary.
-        Return new dictionary.
+        Resolve each item and yield its new key and value as soon as it is resolved.
+
+        None of the keys may be JSONTas queries, see :meth:`stream`. Those are resolved
+        with :meth:`resolve`, since they may rewrite their value or replace the whole
+        dictionary.
 
         :param query_tree: Keep track of the current query_tree. I.e. the full, unresolved,
                            JSON structure that is currently being resolved.
         :type query_tree: dict
         :param json_data: JSON dictionary to resolve.
         :type json_data: dict
-        :return: Newly created dict with resolved values.
-        :rtype: dict
+        :return: Generator of resolved keys and values.
+        :rtype: generator
         """
-        query_tree.update(**deepcopy(json_data))
-        new = json_data.__class__()
+        scratch = json_data
+        if self.__readonly:
+            scratch = self.__scratch.pop(id(json_data), json_data)
+            query_tree = json_data
+        else:
+            query_tree.update(**codec.copy(json_data))
         for key, value in json_data.items():
-            # It's important that the 'resolve' call is before the '__resolve' call.
-            # This will make sure that the lowest values in dictionary are resolved
-            # first.
-            # Example: {"$something": {"$somethingelse": "text"}}
-            # In this case "$somethingelse" will be resolved before "$something".
-            self.logger.debug("Resolve sub-elements.")
+            if self.__readonly:
+                self.__prepare_scratch(scratch, key, value)
             value = self.resolve(value, query_tree[key])
-            self.logger.debug("Resolved value: %r", value)
-            json_data[key] = value
-            self.dataset.add("query_tree", query_tree[key])
-            key, new_value = self.__resolve(key, json_data)
-            if key is None:
-                new = new_value
-            else:
-                if new_value is None:
-                    new[key] = value
-                else:
-                    new[key] = new_value
-        return new
+            yield self.__resolve_item(scratch, query_tree, key, value)
 
-    def __resolve_list(self, json_data, query_tree):
-        """Resolve a list in the JSONTas resolver.
+    def __prepare_scratch(self, scratch, key, value):
+        """Prepare the scratch copy of a value, when resolving read-only.
 
-        Create a new list.
-        Iterate through all json_data items.
-        Resolve all items and add to new list.
-        Return new list.
+        :param scratch: Scratch copy of the parent of the value.
+        :type scratch: dict or list
+        :param key: Key, or index, of the value in its parent.
+        :type key: any
+        :param value: Value that is about to be resolved.
+        :type value: any
+        """
+        if isinstance(value, dict):
+            scratch[key] = self.__scratch[id(value)] = value.__class__(value)
+        elif isinstance(value, (list, set, tuple)):
+            scratch[key] = self.__scratch[id(value)] = list(value)
 
-        :param query_tree: Keep track of the current query_tree. I.e. the full, unresolved,
-                           JSON structure that is currently being resolved.
-        :type query_tree: list
-        :param json_data: JSON list to resolve.
-        :type json_data: tuple, set or list
-        :return: Newly created list with resolved values.
-        :rtype: list
+    def __enter(self, json_data, query_tree, stack, copied=False):
+        """Start resolving JSON data.
+
+        Primitives, and common subtrees that have already been resolved, are resolved
+        directly. Dictionaries and lists are pushed to the stack as a :obj:`Frame`.
+
+        :param json_data: JSON data to resolve.
+        :type json_data: any
+        :param query_tree: Keep track of the current query_tree.
+        :type query_tree: any
+        :param stack: Stack of frames being resolved.
+        :type stack: list
+        :param copied: Whether the query_tree is already a copy of the JSON data.
+                       The query_tree of the JSON data is copied once, at the top, and
+                       nested values use the corresponding part of that copy.
+        :type copied: bool
+        :return: Resolved value or :obj:`jsontas.cache.MISSING` if a frame was pushed.
+        :rtype: any
+        """
+        group = None
+        if self.__common and id(json_data) in self.__common:
+            _, group = self.__common[id(json_data)]
+            if group in self.__results:
+                if self.__debug:
+                    self.logger.debug("Reusing result of common subtree.")
+                return codec.copy(self.__results[group])
+        if isinstance(json_data, dict):
+            if self.__debug:
+                self.logger.debug("Resolving dictionary %r.", json_data)
+            scratch = None
+            if self.__readonly:
+                scratch = self.__scratch.pop(id(json_data), None)
+                if scratch is None:
+                    scratch = json_data.__class__(json_data)
+            elif not copied:
+                query_tree.update(**codec.copy(json_data))
+            stack.append(Frame(json_data, query_tree, group, scratch))
+            return MISSING
+        if isinstance(json_data, (list, set, tuple)):
+            if self.__debug:
+                self.logger.debug("Resolving list %r.", json_data)
+            scratch = None
+            if self.__readonly:
+                scratch = self.__scratch.pop(id(json_data), None)
+                if scratch is None:
+                    scratch = list(json_data)
+            stack.append(Frame(json_data, query_tree, group, scratch))
+            return MISSING
+        if self.__debug:
+            self.logger.debug("Resolving primitive %r.", json_data)
+        if not isinstance(json_data, str) or not json_data.startswith("$"):
+            return json_data
+        key, new_value = self.__resolve(json_data)
+        if new_value is None:
+            return key
+        return new_value
+
+    def __add(self, frame, value):
+        """Add the resolved value of the current item of a frame to the frame.
+
+        :param frame: Frame that is being resolved.
+        :type frame: :obj:`Frame`
+        :param value: Resolved value of the current item.
+        :type value: any
+        """
+        if not frame.is_dict:
+            frame.new.append(value)
+            return
+        if self.__debug:
+            self.logger.debug("Resolved value: %r", value)
+        key, value = self.__resolve_item(frame.scratch, frame.query_tree, frame.key, value)
+        if key is None:
+            frame.new = value
+        else:
+            frame.new[key] = value
+
+    def __leave(self, frame):
+        """Finish resolving a frame.
+
+        :param frame: Frame whose items have all been resolved.
+        :type frame: :obj:`Frame`
+        :return: Newly created dict or list with resolved values.
+        :rtype: any
         """
-        return json_data.__class__(self.resolve(value, query_tree[index])
-                                   for index, value in enumerate(json_data))
+        new = frame.new
+        if not frame.is_dict:
+            new = frame.json_data.__class__(new)
+        if frame.group is not None:
+            self.__results[frame.group] = new
+        return new
 
     def resolve(self, json_data, query_tree=None):
         """Resolve JSONTas queries. Takes a JSON structure and resolve all values against dataset.
 
-        This is a recursive method.
+        Values are resolved bottom-up, i.e. the lowest values in a dictionary are resolved
+        before the keys above them.
+        Example: {"$something": {"$somethingelse": "text"}}
+        In this case "$somethingelse" will be resolved before "$something".
+
+        Nested dictionaries and lists are resolved using an explicit stack of frames
+        instead of recursion, so the depth of the JSON data is not limited by the
+        recursion limit of Python.
 
         :param json_data: JSON data to iterate through and resolve.
         :type json_data: any
-        :param query_tree: Used in recursion to keep track of query_tree.
+        :param query_tree: Keep track of the query_tree. I.e. the full, unresolved,
+                           JSON structure that is currently being resolved.
         :type query_tree: any
         :return: New JSON structure with resolved values.
         :rtype: any
         """
         if query_tree is None:
-            query_tree = {}
-        if isinstance(json_data, dict):
-            self.logger.debug("Resolving dictionary %r.", json_data)
-            new = self.__resolve_dict(json_data, query_tree)
-        elif isinstance(json_data, (list, set, tuple)):
-            self.logger.debug("Resolving list %r.", json_data)
-            new = self.__resolve_list(json_data, query_tree)
-        else:
-            self.logger.debug("Resolving primitive %r.", json_data)
-            key, new_value = self.__resolve(json_data)
-            if new_value is None:
-                return key
-            return new_value
-        return new
+            query_tree = json_data if self.__readonly else {}
+        stack = []
+        result = self.__enter(json_data, query_tree, stack)
+        while stack:
+            frame = stack[-1]
+            if result is not MISSING:
+                # Result of the item that the frame was waiting for.
+                self.__add(frame, result)
+                result = MISSING
+            for key, value in frame.items:
+                frame.key = key
+                query_tree = frame.query_tree[key]
+                copied = True
+                if frame.is_dict and isinstance(value, dict) \
+                        and isinstance(key, str) and key.startswith("$"):
+                    rewritten = self.__rewrite(key, value)
+                    copied = rewritten is value
+                    value = rewritten
+                    if self.__readonly:
+                        query_tree = value
+                value = self.__enter(value, query_tree, stack, copied)
+                if value is MISSING:
+                    if self.__readonly:
+                        # Make resolved values visible through the scratch copy of 'this'.
+                        frame.scratch[key] = stack[-1].scratch
+                    break
+                self.__add(frame, value)
+            else:
+                stack.pop()
+                result = self.__leave(frame)
+        return result
 
-    def run(self, json_data=None, json_file=None, copy=True):
-        """Run JSONTas. This should be the main entry to JSONTas.
+    def bind(self, dataset):
+        """Create a copy of this resolver that resolves against another dataset.
 
-        :param json_data: JSON data to run JSONTas on.
-        :type json_data: :obj:`OrderedDict`
+        :param dataset: Dataset for the new resolver to use.
+        :type dataset: :obj:`jsontas.dataset.Dataset`
+        :return: A shallow copy of this resolver, using the dataset supplied.
+        :rtype: :obj:`JsonTas`
+        """
+        resolver = copy(self)
+        resolver.dataset = dataset
+        resolver.__common = {}
+        resolver.__results = {}
+        resolver.__readonly = False
+        resolver.__scratch = {}
+        resolver.__debug = self.logger.isEnabledFor(logging.DEBUG)
+        return resolver
+
+    def __side_effect_free(self, names):
+        """Check whether queries on dataset names are free of side effects.
+
+        That is, if they only read plain dataset values or execute pure datastructures,
+        and do not depend on anything added to the dataset during a run.
+
+        :param names: Dataset names that queries start from.
+        :type names: iterable
+        :return: Whether all queries on the names are free of side effects.
+        :rtype: bool
+        """
+        for name in names:
+            if name in self.dataset.run_scoped:
+                return False
+            value = self.dataset.get(name)
+            # pylint: disable=unidiomatic-typecheck
+            if type(value) == type(DataStructure):
+                if not getattr(value, "pure", False):
+                    return False
+            elif callable(value):
+                return False
+        return True
+
+    def __find_common(self, json_data, template):
+        """Find the common subtrees of a template, in the JSON data about to be resolved.
+
+        Only subtrees that are free of side effects are evaluated once per run.
+        See :meth:`jsontas.template.Template.common`. Reusing a subtree skips its
+        lookups, and with them the run-scoped values they add (such as 'previous' or
+        'item'), so nothing is reused if the template reads any of those values.
+
+        :param json_data: JSON data, copied from the template, that will be resolved.
+        :type json_data: dict
+        :param template: Compiled template of the JSON data.
+        :type template: :obj:`jsontas.template.Template`
+        """
+        if template.names & (self.dataset.run_scoped - self.resolver_scoped):
+            return
+        for group, (names, paths) in enumerate(template.common):
+            if not self.__side_effect_free(names):
+                continue
+            for path in paths:
+                node = json_data
+                for key in path:
+                    node = node[key]
+                # Keep a reference to the node, so that its id is not reused during the run.
+                self.__common[id(node)] = (node, group)
+
+    def __load(self, json_data, json_file, copy, ordered):  # pylint:disable=redefined-outer-name
+        """Load, and copy, the JSON data to run JSONTas on.
+
+        :param json_data: JSON data, or a compiled template, to run JSONTas on.
+        :type json_data: dict or :obj:`jsontas.template.Template`
         :param json_file: JSON file to run JSONTas on.
         :type json_data: file
-        :return: Resolved JSON structure.
-        :rtype: :obj:`OrderedDict`
+        :param copy: Whether or not to make a deep copy of the JSON data.
+        :type copy: bool
+        :param ordered: Load JSON file as :obj:`OrderedDict` instead of dict.
+        :type ordered: bool
+        :return: JSON data to run JSONTas on and its compiled template, if any.
+        :rtype: tuple
         """
         assert json_data is not None or json_file is not None, \
             "Must supply either 'json_data' or 'json_file'"
+        template = None
         if json_file:
             self.logger.debug("Loading JSON file.")
-            with open(json_file) as _file:
-                json_data = json.load(_file, object_pairs_hook=OrderedDict)
-        if copy:
+            json_data = codec.load(json_file, ordered)
+        elif isinstance(json_data, Template):
+            template = json_data
+            json_data = template.json_data
+        if copy and not json_file:
             self.logger.debug("Deepcopy JSON.")
-            json_data = deepcopy(json_data)
-        assert isinstance(json_data, OrderedDict), "JSON data must be an OrderedDict"
+            json_data = codec.copy(json_data)
+        assert isinstance(json_data, dict), "JSON data must be a dict"
+        return json_data, template
 
-        self.logger.debug("Adding JSON to dataset.")
-        self.dataset.add("this", json_data)
+    def __start(self, json_data, template=None, readonly=False, diagnostics=None):
+        """Create a resolver with a new run context for the JSON data.
+
+        :param json_data: JSON data to run JSONTas on.
+        :type json_data: dict
+        :param template: Compiled template of the JSON data, if any.
+        :type template: :obj:`jsontas.template.Template`
+        :param readonly: Resolve without modifying the JSON data. See :meth:`run`.
+        :type readonly: bool
+        :param diagnostics: Where to record errors during the run, instead of logging them.
+        :type diagnostics: :obj:`jsontas.diagnostics.Diagnostics`
+        :return: A resolver bound to a new dataset context.
+        :rtype: :obj:`JsonTas`
+        """
+        context = self.dataset.context()
+        if diagnostics is not None:
+            context.diagnostics = diagnostics
+        this = json_data
+        if readonly:
+            this = json_data.__class__(json_data)
+        self.logger.debug("Adding JSON to dataset context.")
+        context.add("this", this)
+        resolver = self.bind(context)
+        if readonly:
+            resolver.__readonly = True
+            resolver.__scratch[id(json_data)] = this
+        if template is not None:
+            resolver.__find_common(json_data, template)
+        return resolver
+
+    def run(self, json_data=None, json_file=None, copy=True,  # pylint:disable=redefined-outer-name
+            ordered=True, cache=None, readonly=False, diagnostics=None):
+        """Run JSONTas. This should be the main entry to JSONTas.
+
+        All resolution state for the run is kept in a context created by
+        :meth:`jsontas.dataset.Dataset.context`, leaving the dataset of this
+        resolver untouched. This makes it safe to call 'run' on the same
+        JsonTas instance from several threads at once.
+
+        :param json_data: JSON data, or a compiled template, to run JSONTas on.
+        :type json_data: dict, :obj:`OrderedDict` or :obj:`jsontas.template.Template`
+        :param json_file: JSON file to run JSONTas on.
+        :type json_data: file
+        :param copy: Whether or not to make a deep copy of json_data before resolving it.
+                     The copy is never needed for json_file. Without a copy, a compiled
+                     template can not be run again.
+        :type copy: bool
+        :param ordered: Load json_file as :obj:`OrderedDict`. If False, json_file is
+                        loaded as plain dicts with the fastest parser installed, see
+                        :mod:`jsontas.codec`.
+        :type ordered: bool
+        :param cache: Cache to get the result from, or store it in, if the JSON data is
+                      deterministic.
+        :type cache: :obj:`jsontas.cache.ResultCache`
+        :param readonly: Resolve without modifying, or copying, json_data. Resolved values
+                         are written to shallow copies of each dictionary and list instead,
+                         which are only kept during the run. The same json_data, or
+                         compiled template, can then be shared between runs and threads.
+                         Implies copy=False.
+        :type readonly: bool
+        :param diagnostics: Record errors from failing lookups here, instead of logging
+                            a warning with a traceback for each of them.
+        :type diagnostics: :obj:`jsontas.diagnostics.Diagnostics`
+        :return: Resolved JSON structure.
+        :rtype: dict or :obj:`OrderedDict`
+        """
+        if cache is not None:
+            return self.__run_cached(json_data, json_file, copy, ordered, cache, readonly,
+                                     diagnostics)
+        json_data, template = self.__load(json_data, json_file, copy and not readonly, ordered)
+        resolver = self.__start(json_data, template, readonly, diagnostics)
+        self.logger.debug("Starting resolver.")
+        return resolver.resolve(json_data)
+
+    def __run_cached(self, json_data, json_file,
+                     copy,  # pylint:disable=redefined-outer-name
+                     ordered, cache, readonly, diagnostics):
+        """Run JSONTas, using a result cache. See :meth:`run`.
+
+        :return: Resolved JSON structure.
+        :rtype: dict or :obj:`OrderedDict`
+        """
+        if json_file:
+            template = Template.load(json_file, ordered=ordered)
+            json_data, json_file, copy = template, None, False
+        elif isinstance(json_data, Template):
+            template = json_data
+        else:
+            template = Template(json_data)
+        key = cache.fingerprint(template, self.dataset)
+        if key is None:
+            self.logger.debug("JSON data is not deterministic, skipping cache.")
+            return self.run(json_data, json_file, copy, ordered, readonly=readonly,
+                            diagnostics=diagnostics)
+        result = cache.get(key)
+        if result is not MISSING:
+            self.logger.debug("Result loaded from cache.")
+            return result
+        result = self.run(json_data, json_file, copy, ordered, readonly=readonly,
+                          diagnostics=diagnostics)
+        cache.set(key, result)
+        return result
+
+    def stream(self, json_data=None, json_file=None,
+               copy=True,  # pylint:disable=redefined-outer-name
+               ordered=True, readonly=False, diagnostics=None):
+        """Run JSONTas, yielding each top-level key and value as soon as it is resolved.
+
+        Takes the same parameters as :meth:`run`.
+
+        If a top-level key is a JSONTas query the result may replace the whole
+        JSON structure, which means that it cannot be streamed key by key.
+        In that case the JSON structure is resolved as a whole and yielded
+        as a single value with the key None.
+
+        :return: Generator of resolved top-level keys and values.
+        :rtype: generator
+        """
+        json_data, template = self.__load(json_data, json_file, copy and not readonly, ordered)
+        resolver = self.__start(json_data, template, readonly, diagnostics)
         self.logger.debug("Starting resolver.")
-        return self.resolve(json_data)
+        if any(isinstance(key, str) and key.startswith("$") for key in json_data):
+            yield None, resolver.resolve(json_data)
+            return
+        yield from resolver.__iterate_dict(json_data, {})
@@ -0,0 +1,140 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Memoization module."""
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+
+PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def freeze(value):
+    """Create a hashable, structural, key from JSON data.
+
+    Types are part of the key so that, for instance, 1 and True are not the same.
+
+    :raises: TypeError if value contains anything but JSON data.
+    :param value: JSON data to freeze.
+    :type value: any
+    :return: Hashable representation of value.
+    :rtype: tuple
+    """
+    if isinstance(value, PRIMITIVES):
+        return (type(value), value)
+    if isinstance(value, dict):
+        return (type(value), tuple((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(freeze(item) for item in value))
+    raise TypeError("Can not freeze {!r}".format(type(value)))
+
+
+class Memo:
+    """Bounded cache of results from pure datastructures.
+
+    A datastructure declares itself pure by setting 'pure' to True. The result of a
+    pure datastructure must only depend on its jsonkey and its parameters, which are
+    frozen into a structural key, see :func:`freeze`. The cache is shared between all
+    runs using the same dataset and is safe to use from several threads::
+
+        jsontas = JsonTas(Dataset(memo=Memo(maxsize=1024)))
+        jsontas.run(json_data=json_data)
+        print(jsontas.dataset.memo.stats())
+
+    Note that a pure datastructure is not executed at all on a cache hit, so any
+    run-scoped values it adds to the dataset (e.g. 'item') are not added either.
+    """
+
+    def __init__(self, maxsize=1024):
+        """Initialize memo.
+
+        :param maxsize: Maximum number of results to keep.
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__results = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __copy(value):
+        """Copy a result so that it is independent from the memoized one.
+
+        :param value: Result to copy.
+        :type value: any
+        :return: Copy of value.
+        :rtype: any
+        """
+        if isinstance(value, PRIMITIVES):
+            return value
+        return deepcopy(value)
+
+    def execute(self, datastructure, jsonkey, datasubset, dataset, parameters):
+        """Execute a pure datastructure, or get its result from the cache.
+
+        :param datastructure: Pure datastructure class to execute.
+        :type datastructure: :obj:`jsontas.data_structures.datastructure.DataStructure`
+        :param jsonkey: Name of the key which the datastructure is handling.
+        :type jsonkey: str
+        :param datasubset: Datasubset which the datastructure is handling.
+        :type datasubset: any
+        :param dataset: Dataset object for the datastructure.
+        :type dataset: :obj:`jsontas.dataset.Dataset`
+        :param parameters: Parameters to the datastructure.
+        :type parameters: dict
+        :return: Key and value, as returned by the datastructure.
+        :rtype: tuple
+        """
+        try:
+            key = (datastructure, jsonkey, freeze(parameters))
+        except (TypeError, RecursionError):
+            return datastructure(jsonkey, datasubset, dataset, **parameters).execute()
+        with self.__lock:
+            result = self.__results.get(key)
+            if result is not None:
+                self.hits += 1
+                self.__results.move_to_end(key)
+        if result is not None:
+            return result[0], self.__copy(result[1])
+
+        result = datastructure(jsonkey, datasubset, dataset, **parameters).execute()
+        with self.__lock:
+            self.misses += 1
+            self.__results[key] = (result[0], self.__copy(result[1]))
+            while len(self.__results) > self.maxsize:
+                self.__results.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Remove all results and reset statistics."""
+        with self.__lock:
+            self.__results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Cache statistics.
+
+        :return: Number of hits, misses, current size and maximum size.
+        :rtype: dict
+        """
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.__results),
+                "maxsize": self.maxsize
+            }
@@ -0,0 +1,163 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""JSONTas server module."""
+import logging
+import socketserver
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jsontas import __version__, codec
+from jsontas.template import Template
+
+
+class TemplateCache:
+    """Bounded cache of compiled templates, by the JSON document they were compiled from.
+
+    Clients of a server tend to post the same JSON structures over and over again, so
+    these are only parsed and analysed once. Safe to use from several threads.
+    """
+
+    def __init__(self, maxsize=128):
+        """Initialize cache.
+
+        :param maxsize: Maximum number of templates to keep.
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.__templates = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, source):
+        """Get the compiled template of a JSON document, compiling it if it is not cached.
+
+        :raises: ValueError if source is not valid JSON.
+        :param source: JSON document.
+        :type source: bytes
+        :return: Compiled template. It must not be modified.
+        :rtype: :obj:`jsontas.template.Template`
+        """
+        digest = Template.hash(source, ordered=False)
+        with self.__lock:
+            template = self.__templates.get(digest)
+            if template is not None:
+                self.__templates.move_to_end(digest)
+                return template
+        template = Template(codec.loads(source), digest)
+        with self.__lock:
+            self.__templates[digest] = template
+            while len(self.__templates) > self.maxsize:
+                self.__templates.popitem(last=False)
+        return template
+
+
+class JsonTasHandler(BaseHTTPRequestHandler):
+    """HTTP request handler resolving JSONTas templates.
+
+    A JSONTas JSON structure is posted as the request body and the resolved
+    JSON structure is returned as the response body::
+
+        curl -X POST --data '{"text": "$query.call"}' http://localhost:8000/
+        # {"text": "Chaos"}
+
+    The :obj:`jsontas.jsontas.JsonTas` instance of the server is shared between
+    all requests, so the dataset and any caches, such as a :obj:`jsontas.memo.Memo`
+    in the dataset, are kept warm between calls. So are the compiled templates of
+    the JSON structures posted, see :obj:`TemplateCache`.
+    """
+
+    logger = logging.getLogger("JSONTasServer")
+    server_version = "JSONTas/{}".format(__version__)
+
+    def address_string(self):
+        """Address of the client. Unix sockets have no client address.
+
+        :return: Client address.
+        :rtype: str
+        """
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+        """Log requests to the JSONTas server logger instead of stderr."""
+        self.logger.info("%s - %s", self.address_string(), format % args)
+
+    def __respond(self, status, data):
+        """Send a JSON response to the client.
+
+        :param status: HTTP status code.
+        :type status: int
+        :param data: JSON data to respond with.
+        :type data: any
+        """
+        body = codec.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):  # pylint:disable=invalid-name
+        """Resolve the JSONTas JSON structure posted."""
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            template = self.server.templates.get(self.rfile.read(length))
+            # Templates are shared between requests, so they are copied before each run.
+            data = self.server.jsontas.run(json_data=template)
+        except (ValueError, AssertionError) as exception:
+            self.__respond(400, {"error": str(exception)})
+            return
+        except Exception as exception:  # pylint:disable=broad-except
+            self.logger.exception("Failed to resolve JSON.")
+            self.__respond(500, {"error": str(exception)})
+            return
+        try:
+            self.__respond(200, data)
+        except TypeError as exception:
+            self.logger.exception("Failed to serialize resolved JSON.")
+            self.__respond(500, {"error": str(exception)})
+
+
+class UnixJsonTasServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server listening on a unix socket."""
+
+    daemon_threads = True
+
+
+def create_server(jsontas, host="127.0.0.1", port=8000, unix_socket=None, templates=128):
+    """Create a JSONTas server. Call 'serve_forever' on it to start serving.
+
+    :param jsontas: JSONTas instance to resolve all requests with.
+    :type jsontas: :obj:`jsontas.jsontas.JsonTas`
+    :param host: Host to listen on.
+    :type host: str
+    :param port: Port to listen on. 0 picks a free port.
+    :type port: int
+    :param unix_socket: Path to a unix socket to listen on instead of host and port.
+    :type unix_socket: str
+    :param templates: Maximum number of compiled templates to keep between requests.
+    :type templates: int
+    :return: JSONTas HTTP server.
+    :rtype: :obj:`socketserver.BaseServer`
+    """
+    if unix_socket is not None:
+        server = UnixJsonTasServer(unix_socket, JsonTasHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), JsonTasHandler)
+    server.jsontas = jsontas
+    server.templates = TemplateCache(templates)
+    return server
@@ -0,0 +1,226 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Template module."""
+import os
+import hashlib
+import logging
+from jsontas import __version__, codec
+from jsontas.cache import MISSING, read_pickle, write_pickle
+from jsontas.dataset import Dataset
+
+
+class Template:
+    """Compiled JSONTas template.
+
+    A template is the parsed JSON data together with an analysis of the
+    JSONTas queries in it, and of the subtrees that are repeated in it.
+    Repeated subtrees that are free of side effects are only evaluated once
+    when running a template. Compiled templates can be cached on disk, keyed
+    by the content of the JSON file and the JSONTas version, so that later
+    runs can skip parsing and analysing the same JSON file again::
+
+        template = Template.load("data.json", cache_dir="/tmp/jsontas")
+        JsonTas().run(json_data=template)
+    """
+
+    logger = logging.getLogger("Template")
+
+    def __init__(self, json_data, digest=None):
+        """Compile JSON data into a template.
+
+        :param json_data: JSON data to compile.
+        :type json_data: dict
+        :param digest: Content hash of the JSON data, if known.
+        :type digest: str
+        """
+        self.json_data = json_data
+        self.digest = digest
+        self.queries = self.__analyse(json_data)
+        self.names = frozenset(self.name(query) for query in self.queries)
+        self.common = self.__common_subtrees(json_data)
+
+    @staticmethod
+    def name(query):
+        """Get the name of the dataset value that a query starts from.
+
+        :param query: JSONTas query string, e.g. "$response.json.items".
+        :type query: str
+        :return: Name of the first dataset key in the query, e.g. "response".
+        :rtype: str
+        """
+        words = Dataset.regex.findall(query[1:])
+        return words[0] if words else ""
+
+    @staticmethod
+    def __analyse(json_data):
+        """Find all JSONTas queries, both keys and values, in JSON data.
+
+        :param json_data: JSON data to analyse.
+        :type json_data: any
+        :return: All unique JSONTas query strings in order of appearance.
+        :rtype: tuple
+        """
+        queries = {}
+        stack = [json_data]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                for key in value:
+                    if isinstance(key, str) and key.startswith("$"):
+                        queries[key] = None
+                stack.extend(reversed(list(value.values())))
+            elif isinstance(value, (list, set, tuple)):
+                stack.extend(reversed(list(value)))
+            elif isinstance(value, str) and value.startswith("$"):
+                queries[value] = None
+        return tuple(queries)
+
+    @staticmethod
+    def __digests(json_data):
+        """Calculate a structural digest of every list and dictionary in JSON data.
+
+        Digests are calculated bottom-up, so each node is only hashed once.
+
+        :param json_data: JSON data to calculate digests for.
+        :type json_data: any
+        :return: Digest and whether the node contains any JSONTas queries, by node id.
+        :rtype: dict
+        """
+        digests = {}
+        stack = [(json_data, False)]
+        while stack:
+            node, visited = stack.pop()
+            if isinstance(node, dict):
+                items = node.items()
+            elif isinstance(node, (list, tuple)):
+                items = enumerate(node)
+            else:
+                continue
+            if not visited:
+                stack.append((node, True))
+                children = node.values() if isinstance(node, dict) else node
+                stack.extend((child, False) for child in children)
+                continue
+            parts = []
+            query = False
+            for key, child in items:
+                if id(child) in digests:
+                    digest, child_query = digests[id(child)]
+                else:
+                    digest = hash((type(child), child))
+                    child_query = isinstance(child, str) and child.startswith("$")
+                query = query or child_query or (isinstance(key, str) and key.startswith("$"))
+                parts.append((key, digest))
+            digests[id(node)] = (hash((type(node), tuple(parts))), query)
+        return digests
+
+    @classmethod
+    def __common_subtrees(cls, json_data):
+        """Find structurally identical subtrees with JSONTas queries in them.
+
+        Only the outermost occurrences are returned, i.e. if a subtree is repeated,
+        its repeated children are not returned separately.
+
+        :param json_data: JSON data to search.
+        :type json_data: any
+        :return: For each group of identical subtrees; the names of the dataset values
+                 they read and the paths, from json_data, to every occurrence.
+        :rtype: tuple
+        """
+        try:
+            digests = cls.__digests(json_data)
+        except TypeError:
+            # Only JSON data can be analysed.
+            return ()
+        counts = {}
+        for digest, query in digests.values():
+            if query:
+                counts[digest] = counts.get(digest, 0) + 1
+
+        occurrences = {}
+        stack = [((), json_data)]
+        while stack:
+            path, node = stack.pop()
+            if isinstance(node, dict):
+                items = node.items()
+            elif isinstance(node, (list, tuple)):
+                items = enumerate(node)
+            else:
+                continue
+            digest, query = digests[id(node)]
+            if path and query and counts[digest] > 1:
+                occurrences.setdefault(digest, []).append((path, node))
+                continue
+            stack.extend(reversed([(path + (key,), child) for key, child in items]))
+
+        common = []
+        for nodes in occurrences.values():
+            # Digests may collide, so group by equality as well.
+            while len(nodes) > 1:
+                first = nodes[0][1]
+                same = [path for path, node in nodes if node == first]
+                nodes = [(path, node) for path, node in nodes if node != first]
+                if len(same) > 1:
+                    names = frozenset(cls.name(query) for query in cls.__analyse(first))
+                    common.append((names, tuple(same)))
+        return tuple(common)
+
+    @staticmethod
+    def hash(source, ordered=True):
+        """Hash JSON source together with the JSONTas version.
+
+        :param source: Raw JSON file content.
+        :type source: bytes
+        :param ordered: Whether the template is loaded with :obj:`OrderedDict`.
+        :type ordered: bool
+        :return: Hex digest.
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        digest.update("jsontas {} ordered={}\0".format(__version__, ordered).encode("utf-8"))
+        digest.update(source)
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, json_file, cache_dir=None, ordered=True):
+        """Load and compile a template from a JSON file, using a cache if supplied.
+
+        Changing the JSON file, or the JSONTas version, changes the cache key, so stale
+        entries are never used. See :mod:`jsontas.cache`.
+
+        :param json_file: JSON file to load.
+        :type json_file: str
+        :param cache_dir: Directory to store compiled templates in.
+        :type cache_dir: str
+        :param ordered: Load JSON objects as :obj:`OrderedDict` instead of dict.
+        :type ordered: bool
+        :return: Compiled template.
+        :rtype: :obj:`Template`
+        """
+        with open(json_file, "rb") as _file:
+            source = _file.read()
+        digest = cls.hash(source, ordered)
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, digest + ".pickle")
+            template = read_pickle(path)
+            if template is not MISSING and isinstance(template, cls):
+                cls.logger.debug("Loaded compiled template from %r", path)
+                return template
+        template = cls(codec.loads(source, ordered), digest)
+        if path is not None:
+            write_pickle(path, template)
+        return template
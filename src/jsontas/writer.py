@@ -0,0 +1,199 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""JSON writer module."""
+import json
+from collections.abc import Iterable, Mapping
+from functools import partial
+from itertools import chain
+from jsontas import codec
+
+
+class JsonWriter:
+    """Incremental JSON writer.
+
+    Writes the key and value pairs from :meth:`jsontas.jsontas.JsonTas.stream` as soon
+    as they are resolved, instead of waiting for the whole JSON structure.
+
+    Lazy values, such as generators, are written element by element as they are consumed.
+
+    Supported formats:
+
+    * :compact: A single JSON object without whitespace.
+    * :pretty: An indented JSON object.
+    * :jsonl: One JSON object per line, with a single top-level key in each.
+    """
+
+    formats = ("compact", "pretty", "jsonl")
+
+    def __init__(self, output, fmt="compact", fast=False):
+        """Initialize writer.
+
+        :param output: File to write JSON to.
+        :type output: file
+        :param fmt: Output format. One of 'compact', 'pretty' or 'jsonl'.
+        :type fmt: str
+        :param fast: Use the faster encoder of :mod:`jsontas.codec`, if installed.
+                     Pretty output is then indented with 2 spaces instead of 4.
+        :type fast: bool
+        """
+        assert fmt in self.formats, "Unknown format {!r}".format(fmt)
+        self.output = output
+        self.format = fmt
+        self.indent = None
+        if fmt == "pretty":
+            self.indent = 2 if fast else 4
+        self.separators = (",", ": ") if fmt == "pretty" else (",", ":")
+        self.dumps = partial(codec.dumps, indent=self.indent, fast=fast)
+
+    @staticmethod
+    def __key(key):
+        """Convert a dictionary key to a JSON object key, the same way as 'json' does.
+
+        :param key: Key to convert.
+        :type key: any
+        :return: JSON string of key.
+        :rtype: str
+        """
+        if not isinstance(key, str):
+            key = json.dumps(key)
+        return json.dumps(key)
+
+    def __newline(self, level):
+        """Write a newline and indentation, if the format is indented.
+
+        :param level: Indentation level.
+        :type level: int
+        """
+        if self.indent is not None:
+            self.output.write("\n" + " " * (self.indent * level))
+
+    def __write_items(self, items, level, flush=False):
+        """Write key and value pairs as a JSON object.
+
+        :param items: Key and value pairs to write.
+        :type items: iterable
+        :param level: Indentation level of the object.
+        :type level: int
+        :param flush: Flush the output after each pair.
+        :type flush: bool
+        """
+        self.output.write("{")
+        empty = True
+        for key, value in items:
+            if not empty:
+                self.output.write(self.separators[0])
+            empty = False
+            self.__newline(level + 1)
+            self.output.write(self.__key(key) + self.separators[1])
+            self.__write_value(value, level + 1)
+            if flush:
+                self.output.flush()
+        if not empty:
+            self.__newline(level)
+        self.output.write("}")
+
+    def __write_array(self, values, level):
+        """Write values, lazily, as a JSON array.
+
+        :param values: Values to write.
+        :type values: iterable
+        :param level: Indentation level of the array.
+        :type level: int
+        """
+        self.output.write("[")
+        empty = True
+        for value in values:
+            if not empty:
+                self.output.write(self.separators[0])
+            empty = False
+            self.__newline(level + 1)
+            self.__write_value(value, level + 1)
+        if not empty:
+            self.__newline(level)
+        self.output.write("]")
+
+    def __write_value(self, value, level):
+        """Write a single value.
+
+        Values that the encoder cannot handle, such as generators or containers with
+        generators in them, are walked and written one element at a time.
+
+        :param value: Value to write.
+        :type value: any
+        :param level: Indentation level of the value.
+        :type level: int
+        """
+        try:
+            text = self.dumps(value)
+        except TypeError:
+            if isinstance(value, Mapping):
+                self.__write_items(value.items(), level)
+            elif isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
+                self.__write_array(value, level)
+            else:
+                raise
+            return
+        if self.indent is not None and level:
+            text = text.replace("\n", "\n" + " " * (self.indent * level))
+        self.output.write(text)
+
+    def write(self, items):
+        """Write resolved key and value pairs as they arrive.
+
+        A key of None means that the value is the whole JSON structure,
+        see :meth:`jsontas.jsontas.JsonTas.stream`.
+
+        :param items: Resolved key and value pairs.
+        :type items: iterable
+        """
+        if self.format == "jsonl":
+            self.__write_lines(items)
+            return
+        items = iter(items)
+        first = next(items, None)
+        if first is not None and first[0] is None:
+            self.__write_value(first[1], 0)
+        else:
+            if first is not None:
+                items = chain((first,), items)
+            self.__write_items(items, 0, flush=True)
+        self.output.write("\n")
+        self.output.flush()
+
+    def __write_lines(self, items):
+        """Write each key and value pair as a JSON object on a line of its own.
+
+        If the whole JSON structure is a list, each element is written on a line of its own.
+
+        :param items: Resolved key and value pairs.
+        :type items: iterable
+        """
+        for key, value in items:
+            if key is None:
+                if isinstance(value, Mapping):
+                    self.__write_lines(value.items())
+                    continue
+                if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
+                    for element in value:
+                        self.__write_value(element, 0)
+                        self.output.write("\n")
+                        self.output.flush()
+                    continue
+                self.__write_value(value, 0)
+            else:
+                self.__write_items(((key, value),), 0)
+            self.output.write("\n")
+            self.output.flush()
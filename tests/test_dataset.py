@@ -0,0 +1,74 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Dataset tests for JSONTas."""
+from types import SimpleNamespace
+
+from jsontas.jsontas import JsonTas
+
+EMPLOYEES = [
+    {"name": "John Doe", "occupation": "Engineer", "meta": {"id": 1}},
+    {"name": "Jane Doe", "occupation": "Engineer", "meta": {"id": 2}},
+    {"name": "Jane Smith", "occupation": "Manager", "meta": {"id": 3}}
+]
+
+
+def test_projections():
+    """Test that '[*]' projects a query onto each item as rows and '{*}' as columns."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("employees", EMPLOYEES)
+    data = jsontas.run(json_data={
+        "names": "$employees.name",
+        "rows": "$employees[*].name",
+        "nested": "$employees[*].meta.id",
+        "columns": "$employees{*}"
+    })
+    assert data["names"] == ["John Doe", "Jane Doe", "Jane Smith"]
+    assert data["rows"] == data["names"]
+    assert data["nested"] == [1, 2, 3]
+    assert data["columns"] == {
+        "name": ["John Doe", "Jane Doe", "Jane Smith"],
+        "occupation": ["Engineer", "Engineer", "Manager"],
+        "meta": [{"id": 1}, {"id": 2}, {"id": 3}]
+    }
+
+
+def test_projection_of_columns():
+    """Test that the rest of a query after '{*}' is looked up in each item, as columns."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("employees", EMPLOYEES)
+    data = jsontas.run(json_data={"meta": "$employees{*}.meta", "ids": "$employees{*}.meta.id"})
+    assert data["meta"] == {"id": [1, 2, 3]}
+    assert data["ids"] == [1, 2, 3]
+
+
+def test_lookup_uses_get_of_instances():
+    """Test that objects with a 'get' of their own, not from their type, are asked for keys."""
+    class Proxy:  # pylint:disable=too-few-public-methods
+        """Object that gets its 'get' method from '__getattr__'."""
+
+        def __getattr__(self, name):
+            """Get 'get'."""
+            if name == "get":
+                return lambda key: "proxied " + key
+            raise AttributeError(name)
+
+    jsontas = JsonTas()
+    jsontas.dataset.add("namespace", SimpleNamespace(get=lambda key: "got " + key, a="a"))
+    jsontas.dataset.add("proxy", Proxy())
+    jsontas.dataset.add("attributes", SimpleNamespace(a="a"))
+    data = jsontas.run(json_data={"namespace": "$namespace.a", "proxy": "$proxy.a",
+                                  "attributes": "$attributes.a"})
+    assert data == {"namespace": "got a", "proxy": "proxied a", "attributes": "a"}
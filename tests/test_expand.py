@@ -0,0 +1,84 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Expand tests for JSONTas."""
+import os
+from jsontas.diagnostics import Diagnostics
+from jsontas.jsontas import JsonTas
+
+
+class ParentOnly:
+    """Value that can only be pickled by the process that created it."""
+
+    def __init__(self):
+        """Remember the process that created the value."""
+        self.pid = os.getpid()
+
+    def __getstate__(self):
+        """Fail to pickle the value in any other process, such as a worker process."""
+        if os.getpid() != self.pid:
+            raise TypeError("Can not pickle outside of process %d." % self.pid)
+        return self.__dict__
+
+
+def test_parallel_expand_is_in_order():
+    """Test that expanding in worker processes gives the same result as in one process."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("values", [10])
+    json_data = {"list": {"$expand": {"value": {"index": "$expand_index", "first": "$values.0"},
+                                      "to": 4, "processes": 2}}}
+    data = jsontas.run(json_data=json_data)
+    assert data["list"] == [{"index": index, "first": 10} for index in range(4)]
+
+
+def test_parallel_expand_records_errors():
+    """Test that errors in worker processes are recorded in the diagnostics of the run."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("values", [])
+    json_data = {"list": {"$expand": {"value": {"first": "$values.0"}, "to": 4}}}
+    serial = Diagnostics()
+    jsontas.run(json_data=json_data, diagnostics=serial)
+    json_data["list"]["$expand"]["processes"] = 2
+    diagnostics = Diagnostics()
+    jsontas.run(json_data=json_data, diagnostics=diagnostics)
+    assert diagnostics.summary()["types"]["IndexError"] > 4
+    assert diagnostics.summary() == serial.summary()
+
+
+def test_parallel_expand_falls_back_when_workers_fail():
+    """Test that a failing worker expands in a single process, without partial errors."""
+    jsontas = JsonTas()
+    value = ParentOnly()
+    jsontas.dataset.merge({"values": [], "value": value})
+    json_data = {"list": {"$expand": {"value": {"value": "$value", "first": "$values.0"},
+                                      "to": 4, "processes": 2}}}
+    diagnostics = Diagnostics()
+    data = jsontas.run(json_data=json_data, diagnostics=diagnostics)
+    assert [element["value"] for element in data["list"]] == [value] * 4
+    serial = Diagnostics()
+    json_data["list"]["$expand"]["processes"] = None
+    jsontas.run(json_data=json_data, diagnostics=serial)
+    assert diagnostics.summary() == serial.summary()
+
+
+def test_invalid_processes():
+    """Test that an invalid number of processes expands in a single process."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("values", [10])
+    for processes in (-1, "2", 1.5, True):
+        json_data = {"list": {"$expand": {"value": {"first": "$values.0"},
+                                          "to": 4, "processes": processes}}}
+        data = jsontas.run(json_data=json_data)
+        assert data["list"] == [{"first": 10}] * 4
@@ -0,0 +1,53 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Filter tests for JSONTas."""
+from jsontas.jsontas import JsonTas
+
+
+def test_indexed_filter():
+    """Test that filtering the same list many times, using an index, finds the same items."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("rows", [{"k": index % 3, "id": index} for index in range(9)])
+    json_data = {
+        "eq": {
+            "$expand": {
+                "value": {
+                    "$filter": {
+                        "items": "$rows",
+                        "filters": [{"key": "k", "operator": "$eq", "value": 1}]
+                    }
+                },
+                "to": 3
+            }
+        },
+        "in": {
+            "$expand": {
+                "value": {
+                    "$filter": {
+                        "items": "$rows",
+                        "filters": [{"key": "k", "operator": "$in", "value": [2, 0]}]
+                    }
+                },
+                "to": 3
+            }
+        },
+        "last": "$item.id"
+    }
+    data = jsontas.run(json_data=json_data)
+    assert data["eq"] == [[{"k": 1, "id": 1}, {"k": 1, "id": 4}, {"k": 1, "id": 7}]] * 3
+    assert [row["id"] for row in data["in"][2]] == [0, 2, 3, 5, 6, 8]
+    # 'item' is left as the last item of the list, as when filtering without an index.
+    assert data["last"] == 8
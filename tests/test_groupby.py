@@ -0,0 +1,51 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Group by tests for JSONTas."""
+from jsontas.diagnostics import Diagnostics
+from jsontas.jsontas import JsonTas
+
+
+def test_groupby():
+    """Test that items are grouped by a key, in order of first appearance."""
+    items = [{"status": "success", "id": 1}, {"status": "failure", "id": 2},
+             {"status": "success", "id": 3}]
+    data = JsonTas().run(json_data={
+        "groups": {"$groupby": {"items": items, "key": "status"}},
+        "counts": {"$groupby": {"items": items, "key": "status", "count": True}}
+    })
+    assert list(data["groups"]) == ["success", "failure"]
+    assert data["groups"]["success"] == [items[0], items[2]]
+    assert data["counts"] == {"success": 2, "failure": 1}
+
+
+def test_groupby_unhashable():
+    """Test that items are grouped by key values that are not hashable, such as lists."""
+    items = [{"tags": ["a", "b"]}, {"tags": ["a"]}, {"tags": ["a", "b"]}]
+    data = JsonTas().run(json_data={
+        "counts": {"$groupby": {"items": items, "key": "tags", "count": True}}
+    })
+    assert data["counts"] == {'["a","b"]': 2, '["a"]': 1}
+
+
+def test_groupby_unhashable_and_string():
+    """Test that a list is never grouped together with a string of the same JSON text."""
+    items = [{"tag": ["a"]}, {"tag": '["a"]'}]
+    diagnostics = Diagnostics()
+    data = JsonTas().run(json_data={
+        "counts": {"$groupby": {"items": items, "key": "tag", "count": True}}
+    }, diagnostics=diagnostics)
+    assert data["counts"] != {'["a"]': 2}
+    assert diagnostics.summary()["types"] == {"ValueError": 1}
@@ -0,0 +1,75 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Incremental resolution tests for JSONTas."""
+from jsontas.incremental import Incremental
+from jsontas.jsontas import JsonTas
+
+
+def test_update_only_affected_keys():
+    """Test that only keys reading a changed dataset value are resolved again."""
+    jsontas = JsonTas()
+    jsontas.dataset.merge({"x": 1, "y": 2})
+    incremental = Incremental(jsontas, {"a": "$x", "b": "$y"})
+    incremental.run()
+    jsontas.dataset.add("x", 10)
+    assert incremental.update() == ["a"]
+    assert incremental.output == {"a": 10, "b": 2}
+
+
+def test_update_reader_of_run_scoped_value():
+    """Test that a key reading 'item', added by another key, is updated with it."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("src", {"a": 1, "b": 2})
+    incremental = Incremental(jsontas, {"A": {"$from": {"item": "$src", "get": "a"}},
+                                        "B": "$item.b"})
+    assert incremental.run() == {"A": 1, "B": 2}
+    jsontas.dataset.add("src", {"a": 10, "b": 20})
+    assert incremental.update() == ["A", "B"]
+    assert incremental.output == {"A": 10, "B": 20}
+
+
+def test_edit_reader_of_run_scoped_value():
+    """Test that an edited key reading 'item', added by another key, can still read it."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("src", {"a": 1, "b": 2})
+    incremental = Incremental(jsontas, {"A": {"$from": {"item": "$src", "get": "a"}},
+                                        "B": "b"})
+    incremental.run()
+    incremental.edit({"A": {"$from": {"item": "$src", "get": "a"}}, "B": "$item.a"})
+    incremental.update()
+    assert incremental.output == {"A": 1, "B": 1}
+
+
+def test_edit_removes_and_reorders_keys():
+    """Test that removed keys are removed from the output, and that order is kept."""
+    jsontas = JsonTas()
+    jsontas.dataset.merge({"x": 1, "y": 2})
+    incremental = Incremental(jsontas, {"a": "$x", "b": "$y"})
+    incremental.run()
+    incremental.edit({"c": "$x", "a": "$x"})
+    assert incremental.update() == ["c"]
+    assert list(incremental.output.items()) == [("c", 1), ("a", 1)]
+
+
+def test_update_readers_of_removed_value():
+    """Test that keys reading a dataset value that has been removed are resolved again."""
+    jsontas = JsonTas()
+    jsontas.dataset.merge({"x": 1, "y": 2})
+    incremental = Incremental(jsontas, {"a": "$x", "b": "$y"})
+    incremental.run()
+    jsontas.dataset.remove("x")
+    assert incremental.update() == ["a"]
+    assert incremental.output == {"a": "$x", "b": 2}
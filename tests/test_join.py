@@ -0,0 +1,53 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Join tests for JSONTas."""
+from jsontas.jsontas import JsonTas
+
+LEFT = [{"id": 1, "suite": "smoke"}, {"id": 2, "suite": "nightly"}, {"id": None}]
+RIGHT = [{"suite_id": 1, "status": "success"}, {"suite_id": 1, "status": "failure"},
+         {"suite_id": None, "status": "unknown"}]
+
+
+def test_inner_join():
+    """Test that matching items are merged, in the order of the left items."""
+    data = JsonTas().run(json_data={
+        "joined": {"$join": {"left": LEFT, "right": RIGHT,
+                             "left_key": "id", "right_key": "suite_id"}}
+    })
+    assert data["joined"] == [
+        {"id": 1, "suite": "smoke", "suite_id": 1, "status": "success"},
+        {"id": 1, "suite": "smoke", "suite_id": 1, "status": "failure"}
+    ]
+
+
+def test_left_join_paired():
+    """Test that left items without a match are kept, paired with null."""
+    data = JsonTas().run(json_data={
+        "joined": {"$join": {"left": LEFT[1:], "right": RIGHT, "how": "left",
+                             "output": "paired", "left_key": "id", "right_key": "suite_id"}}
+    })
+    assert data["joined"] == [{"left": LEFT[1], "right": None},
+                              {"left": LEFT[2], "right": None}]
+
+
+def test_join_unhashable():
+    """Test that lists are joined on, but never with a string of the same JSON text."""
+    left = [{"key": ["a"], "side": "left"}]
+    right = [{"key": '["a"]', "text": True}, {"key": ["a"], "text": False}]
+    data = JsonTas().run(json_data={
+        "joined": {"$join": {"left": left, "right": right, "key": "key", "output": "paired"}}
+    })
+    assert data["joined"] == [{"left": left[0], "right": right[1]}]
@@ -0,0 +1,53 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Server tests for JSONTas."""
+import json
+import threading
+from http.client import HTTPConnection
+
+from jsontas.jsontas import JsonTas
+from jsontas.server import TemplateCache, create_server
+
+
+def test_templates_are_compiled_once():
+    """Test that a JSON document is only compiled once and that its template is reused."""
+    cache = TemplateCache(maxsize=1)
+    template = cache.get(b'{"a": "$x"}')
+    assert cache.get(b'{"a": "$x"}') is template
+    cache.get(b'{"b": "$x"}')
+    assert cache.get(b'{"a": "$x"}') is not template
+
+
+def test_serve_same_template_twice():
+    """Test that posting the same JSON structure twice resolves it the same, both times."""
+    jsontas = JsonTas()
+    jsontas.dataset.add("x", {"y": 1})
+    server = create_server(jsontas, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        responses = []
+        for body in ('{"a": "$x.y", "b": {"c": "$x.y"}}',) * 2 + ("not json",):
+            connection = HTTPConnection(*server.server_address)
+            connection.request("POST", "/", body)
+            response = connection.getresponse()
+            responses.append((response.status, json.loads(response.read())))
+            connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert responses[0] == responses[1] == (200, {"a": 1, "b": {"c": 1}})
+    assert responses[2][0] == 400
@@ -0,0 +1,33 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Start-up tests for JSONTas."""
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_cli_import_does_not_load_requests():
+    """Test that importing the command line interface does not import 'requests'.
+
+    Datastructures are loaded lazily, so that only those used by a JSON file are
+    imported. 'requests' is by far the slowest of their imports.
+    """
+    code = "import sys, jsontas.__main__; assert 'requests' not in sys.modules, 'requests'"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        path for path in (SRC, os.environ.get("PYTHONPATH")) if path))
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
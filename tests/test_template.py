@@ -0,0 +1,44 @@
+# Copyright 2020 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Template tests for JSONTas."""
+from jsontas.jsontas import JsonTas
+from jsontas.template import Template
+
+
+def test_common_subtrees_keep_previous():
+    """Test that reusing repeated subtrees does not change what '$previous' is."""
+    json_data = {
+        "a": {"k": "$x.y"},
+        "m": "$z",
+        "b": {"k": "$x.y"},
+        "p": "$previous"
+    }
+    jsontas = JsonTas()
+    jsontas.dataset.add("x", {"y": 1})
+    jsontas.dataset.add("z", 2)
+    expected = jsontas.run(json_data=json_data)
+    assert expected["p"] == 1
+    assert jsontas.run(json_data=Template(json_data)) == expected
+
+
+def test_common_subtrees_are_resolved_once():
+    """Test that repeated subtrees resolve the same when they are reused."""
+    json_data = {"a": {"k": "$x.y"}, "b": {"k": "$x.y"}}
+    template = Template(json_data)
+    assert len(template.common) == 1
+    jsontas = JsonTas()
+    jsontas.dataset.add("x", {"y": 1})
+    assert jsontas.run(json_data=template) == {"a": {"k": 1}, "b": {"k": 1}}